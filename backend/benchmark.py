@@ -0,0 +1,270 @@
+"""
+Reproducible benchmarks for the report export pipeline.
+
+Generates synthetic reports of a configurable shape and drives
+/generate-zip, the phone upload flow and the WebSocket broadcast
+in-process through TestClient. Cold start (importing the app and serving
+a first request) is measured in fresh interpreters. Results are printed
+as JSON.
+
+Usage:
+    python benchmark.py --sections 10 --subsections 3 --cells 6 --images 8 --iterations 20
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def make_image(rng: random.Random, size: int) -> bytes:
+    # Noise keeps the JPEG from compressing to nothing, like a real photo
+    img = Image.frombytes("RGB", (size, size), rng.randbytes(size * size * 3))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def make_report(args, rng: random.Random) -> Tuple[Dict, List[Tuple[str, Tuple[str, bytes, str]]]]:
+    """
+    Builds a synthetic report and the multipart files it references.
+    """
+    images = [make_image(rng, args.image_size) for _ in range(args.images)]
+    files = [("files", (f"bench_{i:03d}.jpg", data, "image/jpeg")) for i, data in enumerate(images)]
+    code_line = "for i in range(10): print(i)  # benchmark\n"
+    code = code_line * max(1, args.code_bytes // len(code_line))
+
+    image_index = 0
+    sections = []
+    for s in range(args.sections):
+        subsections = []
+        for sub in range(args.subsections):
+            cells = []
+            for c in range(args.cells):
+                cell_id = f"{s}_{sub}_{c}"
+                kind = c % 3
+                if kind == 2 and image_index < len(files):
+                    cells.append({
+                        "id": cell_id,
+                        "type": "image",
+                        "mode": "gallery",
+                        "content": files[image_index][1][0],
+                        "caption": f"Figure {image_index}"
+                    })
+                    image_index += 1
+                elif kind == 1:
+                    cells.append({"id": cell_id, "type": "code", "content": code})
+                else:
+                    cells.append({"id": cell_id, "type": "text", "content": f"Paragraph {cell_id} with 50% & $5."})
+            subsections.append({"id": f"sub_{s}_{sub}", "title": f"Subsection {sub}", "cells": cells})
+        sections.append({"id": f"sec_{s}", "title": f"Section {s}", "subsections": subsections})
+
+    report = {"title": "Benchmark Report", "author": "Benchmark", "cells": [], "sections": sections}
+    return report, files
+
+def run_timed(
+    name: str, iterations: int, warmup: int, func: Callable[[], None], before: Optional[Callable[[], None]] = None
+) -> Dict:
+    for _ in range(warmup):
+        if before:
+            before()
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    elapsed = sum(samples)
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "throughput_per_s": iterations / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+    }
+
+def bench_generate_zip(client: TestClient, args, rng: random.Random) -> Dict:
+    report, files = make_report(args, rng)
+    report["split_sections"] = args.split_sections
+    report_json = json.dumps(report)
+    zip_sizes = []
+
+    def call():
+        resp = client.post("/generate-zip", data={"report_json": report_json}, files=files)
+        assert resp.status_code == 200, resp.text
+        zip_sizes.append(len(resp.content))
+
+    def clear_caches():
+        # Otherwise every iteration after warm-up only measures cache hits
+        from services.container import services
+        services.render_cache.clear()
+        services.image_processor.clear_cache()
+
+    result = run_timed(
+        "generate_zip", args.iterations, args.warmup, call, before=None if args.warm_cache else clear_caches
+    )
+    result["zip_bytes"] = zip_sizes[-1] if zip_sizes else 0
+    return result
+
+def bench_upload_flow(client: TestClient, args, rng: random.Random) -> Dict:
+    image = make_image(rng, args.image_size)
+
+    def call():
+        resp = client.post("/upload-sessions", json={
+            "editorSessionId": str(uuid.uuid4()),
+            "targetCellId": "bench_cell"
+        })
+        assert resp.status_code == 200, resp.text
+        session_id = resp.json()["sessionId"]
+        resp = client.post(
+            f"/upload-sessions/{session_id}/image",
+            files={"file": ("bench.jpg", image, "image/jpeg")}
+        )
+        assert resp.status_code == 200, resp.text
+
+    return run_timed("upload_flow", args.iterations, args.warmup, call)
+
+def bench_ws_broadcast(client: TestClient, args, rng: random.Random) -> Dict:
+    image = make_image(rng, args.image_size)
+    editor_session_id = str(uuid.uuid4())
+
+    with client.websocket_connect(f"/ws/report-session/{editor_session_id}") as websocket:
+        def call():
+            resp = client.post("/upload-sessions", json={
+                "editorSessionId": editor_session_id,
+                "targetCellId": "bench_cell"
+            })
+            session_id = resp.json()["sessionId"]
+            resp = client.post(
+                f"/upload-sessions/{session_id}/image",
+                files={"file": ("bench.jpg", image, "image/jpeg")}
+            )
+            assert resp.status_code == 200, resp.text
+            message = websocket.receive_json()
+            assert message["type"] == "photo_uploaded"
+
+        return run_timed("ws_broadcast", args.iterations, args.warmup, call)
+
+COLD_START_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+resp = client.post("/upload-sessions", json={"editorSessionId": "bench", "targetCellId": "bench_cell"})
+assert resp.status_code == 200, resp.text
+done = time.perf_counter()
+print(json.dumps({"import_s": imported - start, "first_request_s": done - imported}))
+"""
+
+def bench_cold_start(client: TestClient, args, rng: random.Random) -> Dict:
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    import_samples = []
+    first_request_samples = []
+    for _ in range(args.iterations):
+        result = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT],
+            cwd=backend_dir, capture_output=True, text=True, check=True
+        )
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        import_samples.append(timings["import_s"])
+        first_request_samples.append(timings["first_request_s"])
+
+    return {
+        "name": "cold_start",
+        "iterations": args.iterations,
+        "import_p50_ms": percentile(import_samples, 50) * 1000,
+        "import_p99_ms": percentile(import_samples, 99) * 1000,
+        "first_request_p50_ms": percentile(first_request_samples, 50) * 1000,
+        "first_request_p99_ms": percentile(first_request_samples, 99) * 1000,
+    }
+
+BENCHMARKS = {
+    "generate_zip": bench_generate_zip,
+    "upload_flow": bench_upload_flow,
+    "ws_broadcast": bench_ws_broadcast,
+    "cold_start": bench_cold_start,
+}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the report export pipeline.")
+    parser.add_argument("--sections", type=int, default=5)
+    parser.add_argument("--subsections", type=int, default=2, help="Subsections per section")
+    parser.add_argument("--cells", type=int, default=6, help="Cells per subsection")
+    parser.add_argument("--images", type=int, default=4, help="Desktop images in the report")
+    parser.add_argument("--image-size", type=int, default=256, help="Image width and height in pixels")
+    parser.add_argument("--code-bytes", type=int, default=512, help="Approximate size of each code cell")
+    parser.add_argument("--split-sections", action="store_true", help="Export with split_sections enabled")
+    parser.add_argument(
+        "--warm-cache", action="store_true",
+        help="Keep the render and image caches between generate_zip iterations"
+    )
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), action="append", help="Run only these benchmarks")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    # The benchmark drives uploads far faster than a person would, so lift
+    # the per-client limits unless they were set explicitly
+    os.environ.setdefault("UPLOAD_RATE_PER_MINUTE", "1000000")
+    os.environ.setdefault("UPLOAD_RATE_BURST", "1000000")
+    os.environ.setdefault("UPLOAD_QUOTA_IMAGES", "1000000")
+    os.environ.setdefault("UPLOAD_QUOTA_BYTES", str(1 << 40))
+    from main import app
+
+    client = TestClient(app)
+    results = []
+    for name in args.only or list(BENCHMARKS):
+        # Each benchmark gets its own seeded generator so results do not
+        # depend on which other benchmarks ran first
+        results.append(BENCHMARKS[name](client, args, random.Random(args.seed)))
+
+    output = {
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "only")
+        },
+        "python": sys.version.split()[0],
+        "benchmarks": results,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
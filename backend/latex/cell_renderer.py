@@ -1,4 +1,8 @@
+import logging
 import re
+from services.metrics import timed
+
+logger = logging.getLogger(__name__)
 
 def escape_latex(text: str) -> str:
     """
@@ -22,13 +26,16 @@ def escape_latex(text: str) -> str:
     pattern = re.compile('|'.join(re.escape(key) for key in chars.keys()))
     return pattern.sub(lambda x: chars[x.group()], text)
 
-def render_cell(cell, image_map):
+@timed("render_cell")
+def render_cell(cell, image_map, code_map=None):
     """
     Converts a single cell into a LaTeX string.
     
     Args:
         cell: Pydantic model or dict containing cell data (type, mode, content, etc.)
         image_map: Dictionary mapping original filenames to their clean names in the zip.
+        code_map: Optional dictionary mapping cell ids to listing files under code/
+            for code cells that were moved out of main.tex.
     
     Returns:
         str: LaTeX content for the cell.
@@ -50,6 +57,11 @@ def render_cell(cell, image_map):
         return f"{safe_content}\n\n"
 
     elif c_type == "code":
+        # Large listings live in their own file inside the ZIP
+        code_filename = (code_map or {}).get(cell.id)
+        if code_filename:
+            return f"\\lstinputlisting{{code/{code_filename}}}\n\n"
+
         # Wrap in lstlisting
         # No escaping needed inside lstlisting usually, except for specific cases, 
         # but basic listing is safe.
@@ -110,5 +122,16 @@ def render_cell(cell, image_map):
                 )
     
     # Unknown cell type - log warning and return empty
-    print(f"WARNING: Unknown cell type '{c_type}' encountered, skipping")
+    logger.warning("Unknown cell type '%s' encountered, skipping", c_type)
     return ""
+
+def render_section(section, image_map, code_map=None):
+    """
+    Converts a section, its subsections and their cells into a LaTeX string.
+    """
+    parts = [f"\\section{{{escape_latex(section.title)}}}\n"]
+    for subsection in section.subsections:
+        parts.append(f"\\subsection{{{escape_latex(subsection.title)}}}\n")
+        for cell in subsection.cells:
+            parts.append(render_cell(cell, image_map, code_map))
+    return "".join(parts)
@@ -1,26 +1,44 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, APIRouter
-from fastapi.responses import Response, JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import FastAPI, HTTPException, APIRouter, Request
+from fastapi.responses import Response, JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Literal, Optional, Set
+import asyncio
 import json
 import os
-import httpx
+import re
+import hashlib
+import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Import local modules
-from latex.cell_renderer import render_cell, escape_latex
+from latex.cell_renderer import render_cell, render_section
 from latex.base_document import BASE_DOCUMENT
-from zip_utils.zip_builder import create_report_zip
+from zip_utils.zip_builder import create_report_zip, ZipStreamWriter
 
-from routers import upload, ws, assets
-from services.asset_store import asset_store
+from routers import upload, ws, assets, metrics, drafts
+from services.container import services
+from services.metrics import timed, PAYLOAD_BYTES, ERRORS
+from services.profiling import profile_request
+from services.report_form import parse_report_form
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Services are created lazily on first use unless preloading is requested
+    if services.settings.preload_services:
+        services.preload()
+    yield
+    services.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,12 +46,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the editor back off when image uploads are rate limited
+    expose_headers=["Retry-After"],
 )
 
+# Opt-in per-request profiling (X-Profile-Token header or profile_token query)
+app.middleware("http")(profile_request)
+
 # Include routers
 app.include_router(upload.router, tags=["upload"])
 app.include_router(ws.router, tags=["websocket"])
 app.include_router(assets.router, tags=["assets"])
+app.include_router(drafts.router, tags=["drafts"])
+app.include_router(metrics.router, tags=["metrics"])
 
 class Cell(BaseModel):
     id: str
@@ -54,24 +79,73 @@ class Section(BaseModel):
     title: str
     subsections: List[Subsection]
 
+class ImagePolicy(BaseModel):
+    normalize: bool = True # resize/re-encode desktop uploads
+    max_dimension: int = Field(1920, gt=0)
+    format: Optional[Literal["jpeg", "png"]] = None # None keeps PNGs as PNG, everything else becomes JPEG
+    quality: int = Field(80, ge=1, le=95)
+    keep_originals: bool = False # also ship untouched files under images/originals/
+
 class Report(BaseModel):
     title: str
     author: str
     cells: List[Cell] = []
     sections: List[Section]
+    split_sections: Optional[bool] = False # write each section to sections/sec_NN.tex
+    image_policy: ImagePolicy = ImagePolicy()
+
+class SharedAssets:
+    """
+    Memoizes image bytes for an export so each phone asset is read from
+    disk, and each upload from its spool file, only once even when several
+    cells or reports of a batch refer to it. Files with identical content
+    share one copy of the bytes.
+    """
+    def __init__(self):
+        self._entries: Dict[str, bytes] = {}
+        self._by_digest: Dict[str, bytes] = {}
+        # One lock per key, so loads of different files run concurrently
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def load(self, key: str, loader) -> bytes:
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            if key not in self._entries:
+                data = await loader()
+                digest = hashlib.sha256(data).hexdigest()
+                self._entries[key] = self._by_digest.setdefault(digest, data)
+            return self._entries[key]
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
 
-async def process_cells(cells: List[Cell], uploaded_file_map, image_files, image_map, image_counter):
+async def read_asset_file(path: str) -> bytes:
+    # Read on a worker thread to keep the event loop free
+    return await asyncio.to_thread(_read_file, path)
+
+async def close_uploads(uploaded_file_map):
+    for file_obj in uploaded_file_map.values():
+        await file_obj.close()
+
+async def read_upload(file_obj) -> bytes:
+    await file_obj.seek(0)
+    return await file_obj.read()
+
+@timed("process_cells")
+async def process_cells(cells: List[Cell], uploaded_file_map, image_files, image_map, image_counter, desktop_images, shared_assets):
     for cell in cells:
         if cell.type == "image" and cell.mode != "placeholder":
             content_bytes = None
             ext = "png"
+            is_desktop = False
             
             # 1. Check for asset_id (pre-uploaded via phone)
             if cell.asset_id:
-                asset_path = asset_store.get_asset_path(cell.asset_id)
+                asset_path = services.asset_store.get_asset_path(cell.asset_id)
                 if asset_path and os.path.exists(asset_path):
-                    with open(asset_path, "rb") as f:
-                        content_bytes = f.read()
+                    content_bytes = await shared_assets.load(
+                        f"asset:{cell.asset_id}", lambda: read_asset_file(asset_path)
+                    )
                     ext = asset_path.split('.')[-1]
             
             # 2. Fallback to multipart upload (desktop)
@@ -80,13 +154,18 @@ async def process_cells(cells: List[Cell], uploaded_file_map, image_files, image
                 if target_filename in uploaded_file_map:
                     file_obj = uploaded_file_map[target_filename]
                     ext = target_filename.split('.')[-1] if '.' in target_filename else 'png'
-                    await file_obj.seek(0)
-                    content_bytes = await file_obj.read()
+                    # Keyed by the upload itself, reports of a batch may reuse a filename
+                    content_bytes = await shared_assets.load(
+                        f"upload:{id(file_obj)}", lambda: read_upload(file_obj)
+                    )
+                    is_desktop = True
             
             # 3. If we have content, add it to the ZIP map
             if content_bytes:
                 clean_name = f"img_{image_counter[0]:03d}.{ext}"
                 image_files[clean_name] = content_bytes
+                if is_desktop:
+                    desktop_images.append(clean_name)
                 # Use id as key in map if filename is not stable
                 # latex renderer uses image_map[cell.original_filename or cell.content]
                 target_key = cell.original_filename or cell.content
@@ -99,75 +178,291 @@ async def process_cells(cells: List[Cell], uploaded_file_map, image_files, image
                 image_map[target_key] = clean_name
                 image_counter[0] += 1
 
+@timed("normalize_images")
+async def normalize_desktop_images(desktop_images: List[str], image_files, image_map, policy: ImagePolicy):
+    if not policy.normalize or not desktop_images:
+        return
+
+    results = await services.image_processor.normalize_many(
+        {name: image_files[name] for name in desktop_images},
+        max_dimension=policy.max_dimension,
+        image_format=policy.format,
+        quality=policy.quality,
+        # Each export takes turns with phone uploads and other exports
+        key=f"export:{id(image_files)}"
+    )
+
+    renamed = {}
+    for old_name, result in results.items():
+        if result is None:
+            # Not something Pillow can decode (e.g. PDF), ship it untouched
+            continue
+        data, ext = result
+        original = image_files.pop(old_name)
+        if policy.keep_originals:
+            image_files[f"originals/{old_name}"] = original
+        new_name = f"{old_name.rsplit('.', 1)[0]}.{ext}"
+        image_files[new_name] = data
+        renamed[old_name] = new_name
+
+    for key, clean_name in image_map.items():
+        if clean_name in renamed:
+            image_map[key] = renamed[clean_name]
+
+def process_code_cells(cells: List[Cell], code_files, code_map, code_hashes):
+    # Code cells larger than this (in bytes) are written to code/ instead of main.tex
+    inline_max_bytes = services.settings.code_inline_max_bytes
+    for cell in cells:
+        if cell.type != "code" or not cell.content:
+            continue
+        content_bytes = cell.content.encode("utf-8")
+        if len(content_bytes) <= inline_max_bytes:
+            continue
+
+        # Identical listings share a single file
+        digest = hashlib.sha256(content_bytes).hexdigest()
+        clean_name = code_hashes.get(digest)
+        if not clean_name:
+            safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", cell.id)
+            clean_name = f"cell_{safe_id}.txt"
+            suffix = 2
+            while clean_name in code_files:
+                # Different ids can sanitise to the same name (a.b, a_b)
+                clean_name = f"cell_{safe_id}_{suffix}.txt"
+                suffix += 1
+            code_files[clean_name] = content_bytes
+            code_hashes[digest] = clean_name
+        code_map[cell.id] = clean_name
+
+def render_section_cached(section: Section, image_map, code_map) -> str:
+    # The rendered output depends on the section itself and on the ZIP names
+    # its image and code cells were assigned in this export
+    cells = [cell for subsection in section.subsections for cell in subsection.cells]
+    refs = {
+        "images": {
+            key: image_map.get(key)
+            for key in (cell.original_filename or cell.content for cell in cells if cell.type == "image")
+            if key
+        },
+        "code": {cell.id: code_map.get(cell.id) for cell in cells if cell.type == "code"},
+    }
+    hasher = hashlib.sha256(section.json().encode("utf-8"))
+    hasher.update(json.dumps(refs, sort_keys=True).encode("utf-8"))
+    cache_key = hasher.hexdigest()
+
+    section_latex = services.render_cache.get(cache_key)
+    if section_latex is None:
+        section_latex = render_section(section, image_map, code_map)
+        services.render_cache.put(cache_key, section_latex)
+    return section_latex
+
+def report_image_filenames(report: Report) -> Set[str]:
+    # Filenames process_cells may look up in the multipart upload
+    cells = list(report.cells)
+    for section in report.sections:
+        for subsection in section.subsections:
+            cells.extend(subsection.cells)
+    return {
+        cell.original_filename or cell.content
+        for cell in cells
+        if cell.type == "image" and cell.mode != "placeholder" and (cell.original_filename or cell.content)
+    }
+
+def referenced_filenames(report_json: str) -> Set[str]:
+    return report_image_filenames(Report(**json.loads(report_json)))
+
+def batch_file_key(field_name: str, filename: str) -> str:
+    # Files in files_N belong to report N (1-based), files in files are shared
+    return f"{field_name}:{filename}"
+
+def batch_referenced_filenames(reports_json: str) -> Set[str]:
+    keys = set()
+    for index, report_data in enumerate(json.loads(reports_json), start=1):
+        for filename in report_image_filenames(Report(**report_data)):
+            keys.add(batch_file_key(f"files_{index}", filename))
+            keys.add(batch_file_key("files", filename))
+    return keys
+
+def batch_report_files(uploaded_files, index: int):
+    # A report's own files take precedence over shared ones with the same name
+    report_files = {}
+    for field_name in ("files", f"files_{index}"):
+        prefix = batch_file_key(field_name, "")
+        for key, file_obj in uploaded_files.items():
+            if key.startswith(prefix):
+                report_files[key[len(prefix):]] = file_obj
+    return report_files
+
+async def build_report_zip(report: Report, uploaded_file_map, shared_assets: SharedAssets) -> bytes:
+    """
+    Runs the export pipeline for one report and returns the ZIP bytes.
+    """
+    # Prepare image map
+    image_files = {} # clean_filename -> bytes
+    image_map = {} # target_key -> clean_filename
+    
+    image_counter = [1] # Using list for mutable counter in recursion/loops
+    desktop_images = [] # clean_filenames that came from multipart uploads
+
+    # Prepare external code listings
+    code_files = {} # clean_filename -> bytes
+    code_map = {} # cell id -> clean_filename
+    code_hashes = {} # sha256 -> clean_filename
+    
+    # Process top-level cells
+    await process_cells(report.cells, uploaded_file_map, image_files, image_map, image_counter, desktop_images, shared_assets)
+    process_code_cells(report.cells, code_files, code_map, code_hashes)
+
+    # Process sections/subsections
+    for section in report.sections:
+        for subsection in section.subsections:
+            await process_cells(subsection.cells, uploaded_file_map, image_files, image_map, image_counter, desktop_images, shared_assets)
+            process_code_cells(subsection.cells, code_files, code_map, code_hashes)
+    
+    # Resize/re-encode desktop uploads in parallel
+    await normalize_desktop_images(desktop_images, image_files, image_map, report.image_policy)
+
+    # Build LaTeX Body
+    latex_body_parts = []
+    
+    # Add TOC if significant
+    if len(report.sections) > 5:
+        latex_body_parts.append("\\tableofcontents\n\\newpage\n\n")
+
+    for cell in report.cells:
+        latex_body_parts.append(render_cell(cell, image_map, code_map))
+
+    section_files = {} # sec_NN.tex -> LaTeX
+    for index, section in enumerate(report.sections, start=1):
+        section_latex = render_section_cached(section, image_map, code_map)
+        if report.split_sections:
+            # \include'd files allow \includeonly builds of a few sections
+            section_name = f"sec_{index:02d}"
+            section_files[f"{section_name}.tex"] = section_latex
+            latex_body_parts.append(f"\\include{{sections/{section_name}}}\n")
+        else:
+            latex_body_parts.append(section_latex)
+    
+    latex_body = "".join(latex_body_parts)
+    
+    # Fill document structure
+    full_latex = BASE_DOCUMENT % {
+        "title": report.title,
+        "author": report.author,
+        "content": latex_body
+    }
+    
+    # Create ZIP off the event loop, deflate releases the GIL
+    zip_bytes = await asyncio.to_thread(create_report_zip, full_latex, image_files, code_files, section_files)
+    PAYLOAD_BYTES.observe(len(zip_bytes), kind="report_zip")
+    return zip_bytes
+
+def report_zip_filename(report: Report) -> str:
+    return f"{report.title.replace(' ', '_').replace('/', '_')}_Report.zip"
+
 @app.post("/generate-zip")
-async def generate_zip(
-    report_json: str = Form(...),
-    files: List[UploadFile] = File(default=[])
-):
+async def generate_zip(request: Request):
+    uploaded_file_map = {}
     try:
+        # Stream the form, keeping only files the report refers to
+        report_json, uploaded_file_map = await parse_report_form(
+            request, referenced_filenames, services.upload_limits
+        )
+
         # Parse JSON
         report_data = json.loads(report_json)
         report = Report(**report_data)
         
-        # Prepare image map
-        image_files = {} # clean_filename -> bytes
-        image_map = {} # target_key -> clean_filename
-        
-        uploaded_file_map = {f.filename: f for f in files}
-        image_counter = [1] # Using list for mutable counter in recursion/loops
-        
-        # Process top-level cells
-        await process_cells(report.cells, uploaded_file_map, image_files, image_map, image_counter)
-
-        # Process sections/subsections
-        for section in report.sections:
-            for subsection in section.subsections:
-                await process_cells(subsection.cells, uploaded_file_map, image_files, image_map, image_counter)
-        
-        # Build LaTeX Body
-        latex_body_parts = []
-        
-        # Add TOC if significant
-        if len(report.sections) > 5:
-            latex_body_parts.append("\\tableofcontents\n\\newpage\n\n")
-
-        for cell in report.cells:
-            latex_body_parts.append(render_cell(cell, image_map))
-
-        for section in report.sections:
-            latex_body_parts.append(f"\\section{{{escape_latex(section.title)}}}\n")
-            for subsection in section.subsections:
-                latex_body_parts.append(f"\\subsection{{{escape_latex(subsection.title)}}}\n")
-                for cell in subsection.cells:
-                    latex_body_parts.append(render_cell(cell, image_map))
-        
-        latex_body = "".join(latex_body_parts)
-        
-        # Fill document structure
-        full_latex = BASE_DOCUMENT % {
-            "title": report.title,
-            "author": report.author,
-            "content": latex_body
-        }
-        
-        # Create ZIP
-        zip_bytes = create_report_zip(full_latex, image_files)
+        zip_bytes = await build_report_zip(report, uploaded_file_map, SharedAssets())
         
         # Return response
-        filename = f"{report.title.replace(' ', '_')}_Report.zip"
+        filename = report_zip_filename(report)
         return Response(
             content=zip_bytes,
             media_type="application/zip",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
 
+    except HTTPException:
+        raise
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON format in report_json")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors()))
+    except Exception as e:
+        ERRORS.inc(endpoint="generate_zip")
+        logger.exception("Failed to generate report ZIP")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await close_uploads(uploaded_file_map)
+
+@app.post("/generate-zip/batch")
+async def generate_zip_batch(request: Request):
+    """
+    Exports many reports in one request. The form carries reports_json (a
+    JSON array of reports), the image files of report N in files_N and
+    files shared by all reports in files. Reports are
+    built concurrently and each finished report ZIP is streamed into one
+    combined archive as soon as it is ready.
+    """
+    uploaded_file_map = {}
+    reports = None
+    try:
+        reports_json, uploaded_file_map = await parse_report_form(
+            request, batch_referenced_filenames, services.upload_limits,
+            field_name="reports_json", file_key=batch_file_key
+        )
+        reports = [Report(**report_data) for report_data in json.loads(reports_json)]
+    except HTTPException:
+        raise
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON format in reports_json")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors()))
     except Exception as e:
-        print(f"ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        ERRORS.inc(endpoint="generate_zip_batch")
+        logger.exception("Failed to read batch export form")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if reports is None:
+            # Otherwise the uploads are closed once the stream is done
+            await close_uploads(uploaded_file_map)
+
+    shared_assets = SharedAssets()
+    semaphore = asyncio.Semaphore(services.settings.batch_export_concurrency)
+
+    async def build(index: int, report: Report):
+        async with semaphore:
+            try:
+                report_files = batch_report_files(uploaded_file_map, index)
+                return index, report, await build_report_zip(report, report_files, shared_assets), None
+            except Exception as e:
+                ERRORS.inc(endpoint="generate_zip_batch")
+                logger.exception("Failed to generate report ZIP %d in batch", index)
+                return index, report, None, str(e)
+
+    async def stream():
+        writer = ZipStreamWriter()
+        tasks = [asyncio.create_task(build(index, report)) for index, report in enumerate(reports, start=1)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, report, zip_bytes, error = await finished
+                if error is None:
+                    yield writer.add(f"{index:03d}_{report_zip_filename(report)}", zip_bytes)
+                else:
+                    # Headers are already sent, so failures are reported inside the archive
+                    yield writer.add(f"{index:03d}_error.txt", f"{report.title}: {error}\n".encode("utf-8"))
+            yield writer.close()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await close_uploads(uploaded_file_map)
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=Reports_Batch.zip"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List, Any
+from datetime import datetime
+
+class DraftSubsection(BaseModel):
+    id: str
+    title: str
+    cellIds: List[str] = []
+
+class DraftSection(BaseModel):
+    id: str
+    title: str
+    subsections: List[DraftSubsection] = []
+
+class DraftLayout(BaseModel):
+    canvasCellIds: List[str] = []
+    sections: List[DraftSection] = []
+
+class DraftSave(BaseModel):
+    title: str = ""
+    author: str = ""
+    layout: DraftLayout
+    cells: Dict[str, Dict[str, Any]] = {}
+
+class DraftPatch(BaseModel):
+    baseRevision: int
+    title: Optional[str] = None
+    author: Optional[str] = None
+    layout: Optional[DraftLayout] = None # omitted when the structure did not change
+    cells: Dict[str, Dict[str, Any]] = {} # changed cells only
+
+class Draft(BaseModel):
+    editorSessionId: str
+    revision: int = 0
+    title: str = ""
+    author: str = ""
+    layout: DraftLayout = Field(default_factory=DraftLayout)
+    cells: Dict[str, Dict[str, Any]] = {}
+    updatedAt: datetime = Field(default_factory=datetime.utcnow)
+
+class DraftSaveResponse(BaseModel):
+    revision: int
+    updatedAt: datetime
@@ -15,6 +15,12 @@ class UploadSession(BaseModel):
     expiresAt: datetime
     status: str = "active" # active, used, expired
 
+class UploadUsage(BaseModel):
+    editorSessionId: str
+    images: int = 0
+    sizeBytes: int = 0
+    windowStart: datetime = Field(default_factory=datetime.utcnow)
+
 class AssetMeta(BaseModel):
     width: int
     height: int
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse
-from services.asset_store import asset_store
+from services.container import services
 import os
 
 router = APIRouter()
 
-@router.get("/assets/{asset_id}")
+# HEAD lets a restored draft check that its images still exist
+@router.api_route("/assets/{asset_id}", methods=["GET", "HEAD"])
 async def get_asset(asset_id: str):
-    path = asset_store.get_asset_path(asset_id)
+    path = services.asset_store.get_asset_path(asset_id)
     if not path or not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Asset not found")
     
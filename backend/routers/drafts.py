@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File, Request
+from models.draft_models import Draft, DraftSave, DraftPatch, DraftSaveResponse
+from models.upload_models import MobileUploadResponse
+from services.draft_store import DraftConflict, DraftTooLarge
+from services.container import services
+from routers.upload import enforce_rate_limit, process_uploaded_image
+
+router = APIRouter()
+
+@router.get("/drafts/{editor_session_id}", response_model=Draft)
+async def get_draft(editor_session_id: str):
+    draft = services.draft_store.get_draft(editor_session_id)
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    return draft
+
+@router.put("/drafts/{editor_session_id}", response_model=DraftSaveResponse)
+async def save_draft(editor_session_id: str, request: DraftSave):
+    try:
+        draft = services.draft_store.save_draft(editor_session_id, request)
+    except DraftTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return DraftSaveResponse(revision=draft.revision, updatedAt=draft.updatedAt)
+
+@router.patch("/drafts/{editor_session_id}", response_model=DraftSaveResponse)
+async def patch_draft(editor_session_id: str, request: DraftPatch):
+    try:
+        draft = services.draft_store.patch_draft(editor_session_id, request)
+    except DraftConflict as e:
+        # Client should fall back to a full save
+        raise HTTPException(status_code=409, detail=str(e))
+    except DraftTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    return DraftSaveResponse(revision=draft.revision, updatedAt=draft.updatedAt)
+
+@router.delete("/drafts/{editor_session_id}")
+async def delete_draft(editor_session_id: str):
+    services.draft_store.delete_draft(editor_session_id)
+    return {"status": "deleted"}
+
+@router.post("/drafts/{editor_session_id}/images", response_model=MobileUploadResponse)
+async def upload_draft_image(editor_session_id: str, http_request: Request, file: UploadFile = File(...)):
+    # Same limits and quota as phone uploads, they share the image pipeline
+    enforce_rate_limit("draft_images", editor_session_id, http_request)
+    processed_data, meta = await process_uploaded_image(editor_session_id, file)
+    asset = services.asset_store.store_asset(processed_data, file.filename, meta)
+
+    return MobileUploadResponse(
+        assetId=asset.assetId,
+        assetUrl=f"/assets/{asset.assetId}",
+        meta=meta
+    )
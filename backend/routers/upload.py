@@ -1,36 +1,76 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Request
 from models.upload_models import UploadSessionCreate, UploadSession, MobileUploadResponse, PhotoUploadedPayload, WSMessage
-from services.session_store import session_store
-from services.image_processing import image_processor
-from services.asset_store import asset_store
-from services.ws_hub import ws_hub
+from services.container import services
+from services.metrics import PAYLOAD_BYTES
+from typing import List, Optional
+import math
 import os
 
 router = APIRouter()
 
+def enforce_rate_limit(scope: str, editor_session_id: str, http_request: Request, upload_session_id: Optional[str] = None):
+    # Limited per editor session and upload session. Limiting per client as
+    # well is opt-in: behind a proxy every request comes from the proxy's
+    # address unless uvicorn is told to trust its forwarded headers
+    keys: List[str] = [f"{scope}:editor:{editor_session_id}"]
+    if upload_session_id:
+        keys.append(f"{scope}:upload:{upload_session_id}")
+    if services.settings.upload_rate_limit_clients and http_request.client:
+        keys.append(f"{scope}:client:{http_request.client.host}")
+    retry_after = services.upload_rate_limiter.acquire(keys)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many upload requests",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+async def process_uploaded_image(editor_session_id: str, file: UploadFile):
+    """
+    Processes an uploaded image on the fair image queue and counts it
+    against the editor session's quota once it was processed successfully.
+    """
+    content = await file.read()
+    PAYLOAD_BYTES.observe(len(content), kind="image_upload")
+    if not services.session_store.has_quota(editor_session_id, len(content)):
+        raise HTTPException(status_code=429, detail="Upload quota exceeded for this editor session")
+
+    # Processing is queued fairly across editor sessions
+    try:
+        processed_data, meta = await services.image_queue.run(
+            editor_session_id, services.image_processor.process_image, content, file.filename
+        )
+    except Exception:
+        raise HTTPException(status_code=400, detail="Unsupported image file")
+
+    if not services.session_store.reserve_upload(editor_session_id, len(content)):
+        raise HTTPException(status_code=429, detail="Upload quota exceeded for this editor session")
+    return processed_data, meta
+
 @router.post("/upload-sessions", response_model=UploadSession)
-async def create_upload_session(request: UploadSessionCreate):
-    session = session_store.create_session(request.editorSessionId, request.targetCellId)
+async def create_upload_session(request: UploadSessionCreate, http_request: Request):
+    enforce_rate_limit("sessions", request.editorSessionId, http_request)
+    session = services.session_store.create_session(request.editorSessionId, request.targetCellId)
     # Note: In a real app, mobileUploadUrl would be constructed using the backend's public URL
     # For now, we return the sessionId and let the frontend build the URL
     return session
 
 @router.get("/upload-sessions/{session_id}", response_model=UploadSession)
 async def validate_upload_session(session_id: str):
-    session = session_store.get_session(session_id)
+    session = services.session_store.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found or expired")
     return session
 
 @router.post("/upload-sessions/{session_id}/image", response_model=MobileUploadResponse)
-async def mobile_upload_image(session_id: str, file: UploadFile = File(...)):
-    session = session_store.get_session(session_id)
+async def mobile_upload_image(session_id: str, http_request: Request, file: UploadFile = File(...)):
+    session = services.session_store.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found or expired")
-    
-    content = await file.read()
-    processed_data, meta = image_processor.process_image(content, file.filename)
-    asset = asset_store.store_asset(processed_data, file.filename, meta)
+    enforce_rate_limit("images", session.editorSessionId, http_request, upload_session_id=session_id)
+
+    processed_data, meta = await process_uploaded_image(session.editorSessionId, file)
+    asset = services.asset_store.store_asset(processed_data, file.filename, meta)
     
     # Broadcast to desktop
     # Note: assetUrl depends on the serving endpoint
@@ -43,12 +83,12 @@ async def mobile_upload_image(session_id: str, file: UploadFile = File(...)):
         meta=meta
     )
     
-    await ws_hub.broadcast(
+    await services.ws_hub.broadcast(
         session.editorSessionId,
         WSMessage(type="photo_uploaded", payload=payload.dict())
     )
     
-    session_store.mark_used(session_id)
+    services.session_store.mark_used(session_id)
     
     return MobileUploadResponse(
         assetId=asset.assetId,
@@ -3,6 +3,7 @@ import uuid
 from typing import Dict, Optional
 from models.upload_models import StoredAsset, AssetMeta
 from datetime import datetime
+from services.metrics import timed
 
 class AssetStore:
     def __init__(self, storage_dir: str = "/tmp/report_assets"):
@@ -10,7 +11,13 @@ class AssetStore:
         self._assets: Dict[str, StoredAsset] = {}
         if not os.path.exists(self.storage_dir):
             os.makedirs(self.storage_dir)
+        # Assets persist across restarts, so start from what is already stored
+        self._total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(self.storage_dir)
+            if entry.is_file() and not entry.name.endswith(".json")
+        )
 
+    @timed("store_asset")
     def store_asset(self, data: bytes, original_filename: str, meta: AssetMeta) -> StoredAsset:
         asset_id = str(uuid.uuid4())
         ext = "jpg" # We normalize to JPEG in image_processor
@@ -29,11 +36,29 @@ class AssetStore:
             width=meta.width,
             height=meta.height
         )
+        # Metadata next to the file, so drafts can still resolve the asset after a restart
+        with open(self._meta_path(asset_id), "w", encoding="utf-8") as f:
+            f.write(asset.json())
         self._assets[asset_id] = asset
+        self._total_bytes += len(data)
         return asset
 
+    def _meta_path(self, asset_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{asset_id}.json")
+
     def get_asset(self, asset_id: str) -> Optional[StoredAsset]:
-        return self._assets.get(asset_id)
+        asset = self._assets.get(asset_id)
+        if asset is None:
+            try:
+                uuid.UUID(asset_id)
+            except ValueError:
+                # Only ids we generated map to files
+                return None
+            meta_path = self._meta_path(asset_id)
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    asset = self._assets[asset_id] = StoredAsset.parse_raw(f.read())
+        return asset
 
     def get_asset_path(self, asset_id: str) -> Optional[str]:
         asset = self.get_asset(asset_id)
@@ -41,4 +66,5 @@ class AssetStore:
             return asset.pathOrKey
         return None
 
-asset_store = AssetStore()
+    def total_bytes(self) -> int:
+        return self._total_bytes
@@ -0,0 +1,207 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from services.metrics import metrics
+
+class Settings:
+    """
+    Service configuration read from the environment.
+    """
+    def __init__(self):
+        self.asset_storage_dir = os.getenv("ASSET_STORAGE_DIR", "/tmp/report_assets")
+        self.upload_session_ttl_seconds = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", "900"))
+        self.upload_quota_images = int(os.getenv("UPLOAD_QUOTA_IMAGES", "200"))
+        self.upload_quota_bytes = int(os.getenv("UPLOAD_QUOTA_BYTES", str(500 * 1024 * 1024)))
+        self.upload_quota_window_seconds = int(os.getenv("UPLOAD_QUOTA_WINDOW_SECONDS", "3600"))
+        self.upload_rate_per_minute = float(os.getenv("UPLOAD_RATE_PER_MINUTE", "30"))
+        self.upload_rate_burst = int(os.getenv("UPLOAD_RATE_BURST", "10"))
+        # Only meaningful when request.client is the real client, i.e. uvicorn
+        # runs with --proxy-headers --forwarded-allow-ips behind a proxy
+        self.upload_rate_limit_clients = os.getenv("UPLOAD_RATE_LIMIT_CLIENTS", "false").lower() in ("1", "true", "yes")
+        self.image_workers = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1)))
+        self.image_max_dimension = int(os.getenv("IMAGE_MAX_DIMENSION", "1920"))
+        self.image_quality = int(os.getenv("IMAGE_QUALITY", "80"))
+        self.image_cache_max_bytes = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.upload_max_file_bytes = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(25 * 1024 * 1024)))
+        self.upload_max_total_bytes = int(os.getenv("UPLOAD_MAX_TOTAL_BYTES", str(100 * 1024 * 1024)))
+        self.upload_spool_max_bytes = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(1024 * 1024)))
+        self.code_inline_max_bytes = int(os.getenv("CODE_INLINE_MAX_BYTES", "4096"))
+        self.batch_export_concurrency = int(os.getenv("BATCH_EXPORT_CONCURRENCY", str(os.cpu_count() or 1)))
+        self.draft_storage_dir = os.getenv("DRAFT_STORAGE_DIR", "/tmp/report_drafts")
+        self.draft_ttl_seconds = int(os.getenv("DRAFT_TTL_SECONDS", str(30 * 24 * 3600)))
+        self.draft_max_cached = int(os.getenv("DRAFT_MAX_CACHED", "1000"))
+        self.draft_max_bytes = int(os.getenv("DRAFT_MAX_BYTES", str(2 * 1024 * 1024)))
+        self.render_cache_max_entries = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "256"))
+        self.preload_services = os.getenv("PRELOAD_SERVICES", "false").lower() in ("1", "true", "yes")
+        self.metrics_enabled = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+        # Profiling is only possible when an admin token is configured
+        self.profile_admin_token = os.getenv("PROFILE_ADMIN_TOKEN")
+        self.profile_output_dir = os.getenv("PROFILE_OUTPUT_DIR", "/tmp/report_profiles")
+
+class ServiceContainer:
+    """
+    Holds the backend's stores and pools. Each service is created on first
+    use, so importing the app does not start threads, touch the filesystem
+    or import Pillow. The FastAPI lifespan can preload them and closes them
+    on shutdown.
+    """
+    def __init__(self, settings: Optional[Settings] = None):
+        self._settings = settings
+        self._instances: Dict[str, Any] = {}
+        # Reentrant, factories may create the services they depend on
+        self._lock = threading.RLock()
+
+    @property
+    def settings(self) -> Settings:
+        if self._settings is None:
+            self._settings = Settings()
+        return self._settings
+
+    def configure(self, settings: Settings):
+        """
+        Replaces the settings. Values read per request (upload and code
+        limits, batch concurrency, metrics, profiling) apply immediately,
+        services already created keep their old configuration.
+        """
+        self._settings = settings
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = factory()
+        return instance
+
+    def peek(self, name: str) -> Optional[Any]:
+        """
+        Returns a service only if it has already been created.
+        """
+        return self._instances.get(name)
+
+    @property
+    def session_store(self):
+        def create():
+            from services.session_store import SessionStore
+            return SessionStore(
+                ttl_seconds=self.settings.upload_session_ttl_seconds,
+                quota_images=self.settings.upload_quota_images,
+                quota_bytes=self.settings.upload_quota_bytes,
+                quota_window_seconds=self.settings.upload_quota_window_seconds
+            )
+        return self._get("session_store", create)
+
+    @property
+    def asset_store(self):
+        def create():
+            from services.asset_store import AssetStore
+            return AssetStore(storage_dir=self.settings.asset_storage_dir)
+        return self._get("asset_store", create)
+
+    @property
+    def image_processor(self):
+        def create():
+            from services.image_processing import ImageProcessor
+            return ImageProcessor(
+                max_dimension=self.settings.image_max_dimension,
+                quality=self.settings.image_quality,
+                cache_max_bytes=self.settings.image_cache_max_bytes,
+                queue=self.image_queue
+            )
+        return self._get("image_processor", create)
+
+    @property
+    def draft_store(self):
+        def create():
+            from services.draft_store import DraftStore
+            return DraftStore(
+                storage_dir=self.settings.draft_storage_dir,
+                ttl_seconds=self.settings.draft_ttl_seconds,
+                max_cached=self.settings.draft_max_cached,
+                max_draft_bytes=self.settings.draft_max_bytes
+            )
+        return self._get("draft_store", create)
+
+    @property
+    def render_cache(self):
+        def create():
+            from services.render_cache import RenderCache
+            return RenderCache(max_entries=self.settings.render_cache_max_entries)
+        return self._get("render_cache", create)
+
+    @property
+    def ws_hub(self):
+        def create():
+            from services.ws_hub import WSHub
+            return WSHub()
+        return self._get("ws_hub", create)
+
+    @property
+    def upload_rate_limiter(self):
+        def create():
+            from services.rate_limiter import TokenBucketLimiter
+            return TokenBucketLimiter(
+                rate_per_second=self.settings.upload_rate_per_minute / 60,
+                burst=self.settings.upload_rate_burst
+            )
+        return self._get("upload_rate_limiter", create)
+
+    @property
+    def image_queue(self):
+        # The one pool for image work, shared by phone uploads and exports.
+        # Pillow releases the GIL while decoding, resizing and encoding,
+        # so threads spread the work across cores
+        def create():
+            from services.fair_queue import FairWorkQueue
+            return FairWorkQueue(workers=self.settings.image_workers)
+        return self._get("image_queue", create)
+
+    @property
+    def upload_limits(self):
+        # Built per request, so it always reflects the current settings
+        from services.report_form import UploadLimits
+        return UploadLimits(
+            max_file_bytes=self.settings.upload_max_file_bytes,
+            max_total_bytes=self.settings.upload_max_total_bytes,
+            spool_max_bytes=self.settings.upload_spool_max_bytes
+        )
+
+    def preload(self):
+        for name in (
+            "session_store", "asset_store", "image_processor", "draft_store",
+            "render_cache", "ws_hub", "upload_rate_limiter", "image_queue"
+        ):
+            getattr(self, name)
+
+    def close(self):
+        """
+        Stops background threads and pools. Services are recreated if used again.
+        """
+        with self._lock:
+            instances, self._instances = self._instances, {}
+        for instance in instances.values():
+            close = getattr(instance, "close", None)
+            if close:
+                close()
+
+services = ServiceContainer()
+
+def _peek_value(name: str, method: str) -> float:
+    # Services that were never used report zero instead of being created
+    instance = services.peek(name)
+    return getattr(instance, method)() if instance is not None else 0
+
+metrics.gauge("upload_sessions_active", "Upload sessions that are still active.").set_function(
+    lambda: _peek_value("session_store", "active_count")
+)
+metrics.gauge("websocket_connections", "Open WebSocket connections.").set_function(
+    lambda: _peek_value("ws_hub", "connection_count")
+)
+metrics.gauge("image_queue_pending", "Image processing jobs waiting for a worker.").set_function(
+    lambda: _peek_value("image_queue", "pending")
+)
+metrics.gauge("asset_store_bytes", "Bytes of assets in the asset store.").set_function(
+    lambda: _peek_value("asset_store", "total_bytes")
+)
@@ -0,0 +1,176 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Set
+import hashlib
+import os
+import threading
+import time
+from models.draft_models import Draft, DraftSave, DraftPatch, DraftLayout
+
+class DraftConflict(Exception):
+    """
+    Raised when an incremental save is based on an outdated revision.
+    """
+
+class DraftTooLarge(Exception):
+    """
+    Raised when a save would make a draft larger than max_draft_bytes.
+    """
+
+def _layout_cell_ids(layout: DraftLayout) -> Set[str]:
+    cell_ids = set(layout.canvasCellIds)
+    for section in layout.sections:
+        for subsection in section.subsections:
+            cell_ids.update(subsection.cellIds)
+    return cell_ids
+
+class DraftStore:
+    """
+    Server-side autosave drafts, one per editor session. Cells are stored
+    by id next to a layout of ids so saves only need to send what changed.
+    Images are referenced by asset id and live in the AssetStore.
+
+    Drafts are written to storage_dir so they survive restarts; at most
+    max_cached of them are kept in memory. Drafts not saved for ttl_seconds
+    are deleted.
+    """
+    def __init__(
+        self,
+        storage_dir: Optional[str] = None,
+        ttl_seconds: int = 30 * 24 * 3600,
+        max_cached: int = 1000,
+        max_draft_bytes: int = 2 * 1024 * 1024,
+        sweep_interval_seconds: int = 600
+    ):
+        self._storage_dir = storage_dir
+        self._ttl = timedelta(seconds=ttl_seconds)
+        self._max_cached = max_cached
+        self._max_draft_bytes = max_draft_bytes
+        self._sweep_interval = sweep_interval_seconds
+        self._last_sweep = 0.0
+        self._drafts: "OrderedDict[str, Draft]" = OrderedDict()
+        self._lock = threading.Lock()
+        if storage_dir and not os.path.exists(storage_dir):
+            os.makedirs(storage_dir)
+
+    def _path(self, editor_session_id: str) -> str:
+        # Session ids come from the client, so they are not used as filenames
+        name = hashlib.sha256(editor_session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self._storage_dir, f"{name}.json")
+
+    def _expired(self, draft: Draft) -> bool:
+        return draft.updatedAt + self._ttl < datetime.utcnow()
+
+    def _load(self, editor_session_id: str) -> Optional[Draft]:
+        # Called with the lock held
+        draft = self._drafts.get(editor_session_id)
+        if draft is None and self._storage_dir:
+            path = self._path(editor_session_id)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    draft = Draft.parse_raw(f.read())
+        if draft is None:
+            return None
+        if self._expired(draft):
+            self._remove(editor_session_id)
+            return None
+        self._cache(draft)
+        return draft
+
+    def _cache(self, draft: Draft):
+        self._drafts[draft.editorSessionId] = draft
+        self._drafts.move_to_end(draft.editorSessionId)
+        while len(self._drafts) > self._max_cached:
+            # Still on disk when a storage_dir is configured
+            self._drafts.popitem(last=False)
+
+    def _store(self, draft: Draft):
+        # Called with the lock held
+        data = draft.json()
+        if len(data.encode("utf-8")) > self._max_draft_bytes:
+            raise DraftTooLarge(f"Draft exceeds {self._max_draft_bytes} bytes")
+        if self._storage_dir:
+            path = self._path(draft.editorSessionId)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self._cache(draft)
+        self._sweep()
+
+    def _remove(self, editor_session_id: str):
+        self._drafts.pop(editor_session_id, None)
+        if self._storage_dir:
+            try:
+                os.remove(self._path(editor_session_id))
+            except FileNotFoundError:
+                pass
+
+    def _sweep(self):
+        # Deletes expired drafts, at most once per sweep interval
+        now = time.time()
+        if now - self._last_sweep < self._sweep_interval:
+            return
+        self._last_sweep = now
+
+        for editor_session_id in [eid for eid, d in self._drafts.items() if self._expired(d)]:
+            self._remove(editor_session_id)
+        if self._storage_dir:
+            cutoff = now - self._ttl.total_seconds()
+            for entry in os.scandir(self._storage_dir):
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+
+    def get_draft(self, editor_session_id: str) -> Optional[Draft]:
+        with self._lock:
+            draft = self._load(editor_session_id)
+            return draft.copy(deep=True) if draft else None
+
+    def save_draft(self, editor_session_id: str, data: DraftSave) -> Draft:
+        with self._lock:
+            previous = self._load(editor_session_id)
+            keep = _layout_cell_ids(data.layout)
+            draft = Draft(
+                editorSessionId=editor_session_id,
+                revision=(previous.revision + 1) if previous else 1,
+                title=data.title,
+                author=data.author,
+                layout=data.layout,
+                cells={cell_id: cell for cell_id, cell in data.cells.items() if cell_id in keep}
+            )
+            self._store(draft)
+            return draft
+
+    def patch_draft(self, editor_session_id: str, patch: DraftPatch) -> Optional[Draft]:
+        with self._lock:
+            current = self._load(editor_session_id)
+            if not current:
+                return None
+            if current.revision != patch.baseRevision:
+                raise DraftConflict(f"Draft is at revision {current.revision}, not {patch.baseRevision}")
+
+            # Applied to a copy so a rejected patch leaves the draft untouched
+            draft = current.copy(deep=True)
+            if patch.title is not None:
+                draft.title = patch.title
+            if patch.author is not None:
+                draft.author = patch.author
+            draft.cells.update(patch.cells)
+            if patch.layout is not None:
+                draft.layout = patch.layout
+                # Cells no longer in the layout were deleted
+                keep = _layout_cell_ids(draft.layout)
+                draft.cells = {cell_id: cell for cell_id, cell in draft.cells.items() if cell_id in keep}
+
+            draft.revision += 1
+            draft.updatedAt = datetime.utcnow()
+            self._store(draft)
+            return draft
+
+    def delete_draft(self, editor_session_id: str):
+        with self._lock:
+            self._remove(editor_session_id)
+
+    def cached_count(self) -> int:
+        with self._lock:
+            return len(self._drafts)
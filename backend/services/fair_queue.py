@@ -0,0 +1,83 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional, Tuple
+
+class FairWorkQueue:
+    """
+    Runs blocking work on a thread pool, taking jobs round-robin across
+    keys (editor sessions) so one busy session cannot starve the others.
+    """
+    def __init__(self, workers: int):
+        self._workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fair-queue")
+        self._queues: "OrderedDict[str, Deque[Tuple[asyncio.Future, Callable, tuple]]]" = OrderedDict()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    async def run(self, key: str, func: Callable, *args) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        # Runs in the caller's context, like asyncio.to_thread
+        context = contextvars.copy_context()
+        with self._lock:
+            self._queues.setdefault(key, deque()).append((future, functools.partial(context.run, func), args))
+        self._dispatch()
+        return await future
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _next_job(self) -> Optional[Tuple[asyncio.Future, Callable, tuple]]:
+        # Called with the lock held
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            if queue:
+                # Back of the line until every other key had a turn
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if not job[0].cancelled():
+                return job
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._active >= self._workers:
+                    return
+                job = self._next_job()
+                if job is None:
+                    return
+                self._active += 1
+            future, func, args = job
+            self._executor.submit(func, *args).add_done_callback(
+                lambda done, future=future: self._finished(done, future)
+            )
+
+    def _finished(self, done, future: asyncio.Future):
+        with self._lock:
+            self._active -= 1
+        try:
+            future.get_loop().call_soon_threadsafe(self._resolve, future, done)
+        except RuntimeError:
+            # The waiting request's event loop is gone
+            pass
+        self._dispatch()
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, done):
+        if future.cancelled():
+            return
+        error = done.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(done.result())
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -1,15 +1,77 @@
 from PIL import Image, ExifTags
+import asyncio
+import hashlib
 import io
-import os
-from typing import Tuple, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple, Optional
 from models.upload_models import AssetMeta
+from services.fair_queue import FairWorkQueue
+from services.metrics import timed
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+class ProcessedImageCache:
+    """
+    LRU cache of normalized images keyed by content hash and policy,
+    bounded by the total size of the cached output.
+    """
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Tuple[bytes, str]):
+        if len(value[0]) > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = value
+            self._bytes += len(value[0])
+            while self._bytes > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
 
 class ImageProcessor:
-    def __init__(self, max_dimension: int = 1920, quality: int = 80):
+    def __init__(
+        self,
+        max_dimension: int = 1920,
+        quality: int = 80,
+        cache_max_bytes: int = 256 * 1024 * 1024,
+        queue: Optional[FairWorkQueue] = None
+    ):
         self.max_dimension = max_dimension
         self.quality = quality
+        self._cache = ProcessedImageCache(max_bytes=cache_max_bytes)
+        # Pool used by normalize_many, shared with phone uploads
+        self._queue = queue
 
-    def process_image(self, data: bytes, filename: str) -> Tuple[bytes, AssetMeta]:
+    @timed("process_image")
+    def process_image(
+        self,
+        data: bytes,
+        filename: str,
+        max_dimension: Optional[int] = None,
+        image_format: str = "jpeg",
+        quality: Optional[int] = None
+    ) -> Tuple[bytes, AssetMeta]:
+        max_dimension = max_dimension or self.max_dimension
+        quality = quality or self.quality
         img = Image.open(io.BytesIO(data))
         
         # Auto-orient using EXIF
@@ -31,34 +93,89 @@ class ImageProcessor:
 
         # Resize if needed
         width, height = img.size
-        if max(width, height) > self.max_dimension:
+        if max(width, height) > max_dimension:
             if width > height:
-                new_width = self.max_dimension
-                new_height = int(height * (self.max_dimension / width))
+                new_width = max_dimension
+                new_height = int(height * (max_dimension / width))
             else:
-                new_height = self.max_dimension
-                new_width = int(width * (self.max_dimension / height))
+                new_height = max_dimension
+                new_width = int(width * (max_dimension / height))
             img = img.resize((new_width, new_height), Image.LANCZOS)
             width, height = new_width, new_height
 
-        # Convert to RGB if necessary (e.g., for RGBA to JPEG)
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-        elif img.mode != "RGB":
-            img = img.convert("RGB")
-
-        # Save to buffer
         output_buffer = io.BytesIO()
-        img.save(output_buffer, format="JPEG", quality=self.quality, optimize=True, progressive=True)
+        if image_format == "png":
+            # PNG keeps transparency; modes PNG cannot store (e.g. CMYK) are converted
+            if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                img = img.convert("RGBA")
+            img.save(output_buffer, format="PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+                # JPEG has no alpha channel, flatten onto white so transparent
+                # backgrounds of diagrams and plots do not turn black
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            img.save(output_buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+            mime_type = "image/jpeg"
         processed_data = output_buffer.getvalue()
         
         meta = AssetMeta(
             width=width,
             height=height,
             sizeBytes=len(processed_data),
-            mimeType="image/jpeg"
+            mimeType=mime_type
         )
         
         return processed_data, meta
 
-image_processor = ImageProcessor()
+    def normalize_image(
+        self, data: bytes, max_dimension: int, image_format: Optional[str], quality: int
+    ) -> Tuple[bytes, str]:
+        """
+        Resizes and re-encodes an image, reusing earlier results for the
+        same content and policy. Returns the new bytes and file extension.
+        Without an image_format PNGs stay PNG (screenshots and plots
+        compress badly as JPEG) and everything else becomes JPEG.
+        """
+        if image_format is None:
+            image_format = "png" if data.startswith(PNG_SIGNATURE) else "jpeg"
+        key = hashlib.sha256(data).hexdigest() + f":{max_dimension}:{image_format}:{quality}"
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        processed_data, _ = self.process_image(
+            data, "", max_dimension=max_dimension, image_format=image_format, quality=quality
+        )
+        result = (processed_data, "png" if image_format == "png" else "jpg")
+        self._cache.put(key, result)
+        return result
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    async def normalize_many(
+        self, images: Dict[str, bytes], max_dimension: int, image_format: Optional[str], quality: int, key: str
+    ) -> Dict[str, Optional[Tuple[bytes, str]]]:
+        """
+        Normalizes several images in parallel on the shared image queue,
+        where key is the fairness key of the work. Images that cannot be
+        decoded map to None so the caller can keep the original bytes.
+        """
+        names = list(images)
+        results = await asyncio.gather(
+            *(
+                self._queue.run(key, self.normalize_image, images[name], max_dimension, image_format, quality)
+                for name in names
+            ),
+            return_exceptions=True
+        )
+        return {
+            name: None if isinstance(result, Exception) else result
+            for name, result in zip(names, results)
+        }
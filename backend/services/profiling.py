@@ -0,0 +1,112 @@
+import cProfile
+import hmac
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_QUERY_PARAM = "profile_token"
+
+# stage -> [total seconds, calls] for the request being profiled. Work
+# submitted to thread pools must run in a copy of the request's context
+# (contextvars.copy_context().run) for its stages to be recorded here.
+_stage_timings: ContextVar[Optional[Dict[str, List]]] = ContextVar("stage_timings", default=None)
+_stage_lock = threading.Lock()
+
+# cProfile cannot run two profilers at once, so concurrent profiled
+# requests still get Server-Timing but only one gets a .prof file
+_profiler_lock = threading.Lock()
+
+_container = None
+
+def current_settings():
+    """
+    Returns the container's settings. The container is looked up once and
+    cached, since this runs on every call of a timed function.
+    """
+    global _container
+    if _container is None:
+        # Imported here, the container imports metrics which imports this module
+        from services.container import services
+        _container = services
+    return _container.settings
+
+def record_stage(stage: str, seconds: float):
+    timings = _stage_timings.get()
+    if timings is not None:
+        # Stages also finish on worker threads
+        with _stage_lock:
+            entry = timings.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+def format_server_timing(timings: Dict[str, List], total_seconds: float) -> str:
+    parts = [
+        f'{stage};dur={seconds * 1000:.2f};desc="{calls} calls"'
+        for stage, (seconds, calls) in timings.items()
+    ]
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+def _profile_path(request: Request) -> str:
+    route = request.url.path.strip("/").replace("/", "_") or "root"
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}_{route}_{uuid.uuid4().hex[:8]}.prof"
+    return os.path.join(current_settings().profile_output_dir, filename)
+
+async def profile_request(request: Request, call_next):
+    """
+    HTTP middleware that profiles a single request when it carries a valid
+    admin token in the X-Profile-Token header or profile_token query
+    parameter. The cProfile output is written to PROFILE_OUTPUT_DIR and a
+    per-stage breakdown is returned in the Server-Timing header.
+
+    cProfile only sees the event loop thread, so ZIP compression and image
+    normalization show up in Server-Timing but not in the .prof file. It
+    also records every other request handled on the loop meanwhile, so
+    profile on an otherwise idle instance. Server-Timing only covers this
+    request.
+    Streamed responses are buffered so both cover the whole body.
+    """
+    token = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY_PARAM)
+    admin_token = current_settings().profile_admin_token
+    if token is None or not admin_token:
+        return await call_next(request)
+    if not hmac.compare_digest(token.encode("utf-8"), admin_token.encode("utf-8")):
+        return JSONResponse(status_code=403, content={"detail": "Invalid profiling token"})
+
+    timings: Dict[str, List] = {}
+    context_token = _stage_timings.set(timings)
+    profiler = cProfile.Profile() if _profiler_lock.acquire(blocking=False) else None
+    start = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        try:
+            response = await call_next(request)
+            # Streamed bodies (e.g. /generate-zip/batch) are produced after
+            # call_next returns, read them while the request is still profiled
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            response = Response(content=body, status_code=response.status_code, headers=response.headers)
+        finally:
+            if profiler:
+                profiler.disable()
+    finally:
+        _stage_timings.reset(context_token)
+        if profiler:
+            _profiler_lock.release()
+    total_seconds = time.perf_counter() - start
+
+    if profiler:
+        path = _profile_path(request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+        response.headers["X-Profile-File"] = os.path.basename(path)
+
+    response.headers["Server-Timing"] = format_server_timing(timings, total_seconds)
+    return response
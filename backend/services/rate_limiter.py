@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Callable, Dict, Sequence, Tuple
+
+class TokenBucketLimiter:
+    """
+    In-process token bucket limiter. Each key gets a bucket of `burst`
+    tokens refilled at `rate_per_second`; a request takes one token from
+    every key it is checked against.
+    """
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._rate = rate_per_second
+        self._burst = burst
+        self._max_keys = max_keys
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {} # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (self._burst, now))
+        return min(self._burst, tokens + (now - updated_at) * self._rate)
+
+    def acquire(self, keys: Sequence[str]) -> float:
+        """
+        Takes a token for every key if all of them have one.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds to wait.
+        """
+        with self._lock:
+            now = self._clock()
+            available = {key: self._tokens(key, now) for key in keys}
+            missing = max((1 - tokens for tokens in available.values()), default=0)
+            if missing > 0:
+                return missing / self._rate
+
+            for key, tokens in available.items():
+                self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self._max_keys:
+                self._prune(now)
+            return 0.0
+
+    def _prune(self, now: float):
+        # Full buckets carry no state worth keeping
+        for key in [key for key in self._buckets if self._tokens(key, now) >= self._burst]:
+            del self._buckets[key]
@@ -0,0 +1,31 @@
+from collections import OrderedDict
+from typing import Optional
+import threading
+
+class RenderCache:
+    """
+    Small LRU cache for rendered LaTeX fragments, keyed by content hash.
+    Lets repeated exports reuse sections that have not changed.
+    """
+    def __init__(self, max_entries: int = 256):
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
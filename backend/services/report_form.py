@@ -0,0 +1,226 @@
+from tempfile import SpooledTemporaryFile
+from urllib.parse import parse_qsl
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, Request, UploadFile
+from starlette.datastructures import Headers
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+class UploadLimits:
+    def __init__(
+        self,
+        max_file_bytes: int = 25 * 1024 * 1024,
+        max_total_bytes: int = 100 * 1024 * 1024,
+        spool_max_bytes: int = 1024 * 1024,
+    ):
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.spool_max_bytes = spool_max_bytes
+
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=detail)
+
+class _ReportFormParser:
+    """
+    Incremental multipart/form-data parser for /generate-zip.
+
+    Once the report JSON field has been received, file parts whose key (see
+    file_key) is not referenced by the report are discarded as they stream
+    in instead of being buffered. Kept files are spooled to disk above
+    spool_max_bytes.
+    """
+    def __init__(
+        self,
+        boundary: bytes,
+        referenced_files: Callable[[str], Set[str]],
+        limits: UploadLimits,
+        field_name: str,
+        file_key: Callable[[str, str], str]
+    ):
+        self.report_json: Optional[str] = None
+        self._report_field = field_name
+        self._file_key = file_key
+        self.files: Dict[str, UploadFile] = {}
+        self._referenced_files = referenced_files
+        self._referenced: Optional[Set[str]] = None
+        self._limits = limits
+        self._total_bytes = 0
+        self._messages: List[Tuple[str, bytes]] = []
+
+        # Per-part state
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._field_name = ""
+        self._field_data = bytearray()
+        self._filename: Optional[str] = None
+        self._key: Optional[str] = None
+        self._upload: Optional[UploadFile] = None
+        self._part_bytes = 0
+
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": lambda: self._messages.append(("part_begin", b"")),
+            "on_part_data": lambda data, start, end: self._messages.append(("part_data", data[start:end])),
+            "on_part_end": lambda: self._messages.append(("part_end", b"")),
+            "on_header_field": lambda data, start, end: self._messages.append(("header_field", data[start:end])),
+            "on_header_value": lambda data, start, end: self._messages.append(("header_value", data[start:end])),
+            "on_header_end": lambda: self._messages.append(("header_end", b"")),
+            "on_headers_finished": lambda: self._messages.append(("headers_finished", b"")),
+        })
+
+    async def feed(self, chunk: bytes):
+        self._total_bytes += len(chunk)
+        if self._total_bytes > self._limits.max_total_bytes:
+            raise _too_large(f"Request exceeds {self._limits.max_total_bytes} bytes")
+
+        self._parser.write(chunk)
+        messages, self._messages = self._messages, []
+        for kind, data in messages:
+            if kind == "part_begin":
+                self._headers = []
+                self._header_field = b""
+                self._header_value = b""
+                self._field_data = bytearray()
+                self._filename = None
+                self._upload = None
+                self._part_bytes = 0
+            elif kind == "header_field":
+                self._header_field += data
+            elif kind == "header_value":
+                self._header_value += data
+            elif kind == "header_end":
+                self._headers.append((self._header_field.lower(), self._header_value))
+                self._header_field = b""
+                self._header_value = b""
+            elif kind == "headers_finished":
+                self._start_part()
+            elif kind == "part_data":
+                await self._part_data(data)
+            elif kind == "part_end":
+                await self._end_part()
+
+    def finish(self):
+        self._parser.finalize()
+
+    def _start_part(self):
+        headers = dict(self._headers)
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        self._field_name = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+        if filename is None:
+            return
+
+        self._filename = filename.decode("utf-8", errors="replace")
+        self._key = self._file_key(self._field_name, self._filename)
+        if self._referenced is not None and self._key not in self._referenced:
+            # Not used by any cell, drop the bytes as they arrive
+            return
+        self._upload = UploadFile(
+            file=SpooledTemporaryFile(max_size=self._limits.spool_max_bytes),
+            filename=self._filename,
+            headers=Headers(raw=self._headers),
+        )
+
+    async def _part_data(self, data: bytes):
+        self._part_bytes += len(data)
+        if self._part_bytes > self._limits.max_file_bytes:
+            raise _too_large(f"Part '{self._filename or self._field_name}' exceeds {self._limits.max_file_bytes} bytes")
+
+        if self._filename is None:
+            self._field_data.extend(data)
+        elif self._upload is not None:
+            await self._upload.write(data)
+
+    async def _end_part(self):
+        if self._filename is None:
+            if self._field_name == self._report_field:
+                self.report_json = self._field_data.decode("utf-8")
+                self._referenced = self._referenced_files(self.report_json)
+            return
+
+        if self._upload is not None:
+            await self._upload.seek(0)
+            previous = self.files.pop(self._key, None)
+            if previous is not None:
+                await previous.close()
+            self.files[self._key] = self._upload
+            self._upload = None
+
+    async def drop_unreferenced(self):
+        # Files that arrived before report_json could not be filtered while streaming
+        for key in list(self.files):
+            if key not in (self._referenced or set()):
+                await self.files.pop(key).close()
+
+    async def close(self):
+        if self._upload is not None:
+            await self._upload.close()
+        for upload in self.files.values():
+            await upload.close()
+
+async def parse_report_form(
+    request: Request,
+    referenced_files: Callable[[str], Set[str]],
+    limits: UploadLimits,
+    field_name: str = "report_json",
+    file_key: Callable[[str, str], str] = lambda field_name, filename: filename
+) -> Tuple[str, Dict[str, UploadFile]]:
+    """
+    Reads the /generate-zip form from the request stream.
+
+    Args:
+        request: The incoming request.
+        referenced_files: Called with the report JSON, returns the file keys cells refer to.
+        limits: Per-file, total and spool size limits.
+        field_name: Name of the form field carrying the report JSON.
+        file_key: Maps a file part's field name and filename to its key.
+            Defaults to the filename.
+
+    Returns:
+        The report JSON string and a map of referenced file keys to UploadFile.
+        The caller is responsible for closing the returned files.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limits.max_total_bytes:
+        raise _too_large(f"Request exceeds {limits.max_total_bytes} bytes")
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        # Plain forms only carry report_json. Chunked bodies have no
+        # Content-Length, so the size is checked while reading
+        body = bytearray()
+        async for chunk in request.stream():
+            body.extend(chunk)
+            if len(body) > limits.max_total_bytes:
+                raise _too_large(f"Request exceeds {limits.max_total_bytes} bytes")
+        fields = {}
+        if content_type == b"application/x-www-form-urlencoded":
+            fields = dict(parse_qsl(body.decode("utf-8", errors="replace"), keep_blank_values=True))
+        report_json = fields.get(field_name)
+        if report_json is None:
+            raise HTTPException(status_code=422, detail=f"{field_name} is required")
+        return report_json, {}
+
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Missing multipart boundary")
+
+    parser = _ReportFormParser(boundary, referenced_files, limits, field_name, file_key)
+    try:
+        async for chunk in request.stream():
+            await parser.feed(chunk)
+        parser.finish()
+    except BaseException:
+        await parser.close()
+        raise
+
+    if parser.report_json is None:
+        await parser.close()
+        raise HTTPException(status_code=422, detail=f"{field_name} is required")
+
+    await parser.drop_unreferenced()
+    return parser.report_json, parser.files
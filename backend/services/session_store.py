@@ -1,14 +1,25 @@
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 import threading
-import time
-from models.upload_models import UploadSession
+from models.upload_models import UploadSession, UploadUsage
 
 class SessionStore:
-    def __init__(self, ttl_seconds: int = 900):
+    def __init__(
+        self,
+        ttl_seconds: int = 900,
+        quota_images: int = 200,
+        quota_bytes: int = 500 * 1024 * 1024,
+        quota_window_seconds: int = 3600
+    ):
         self._sessions: Dict[str, UploadSession] = {}
         self._ttl_seconds = ttl_seconds
+        # Per editor session upload usage, reset every quota window
+        self._usage: Dict[str, UploadUsage] = {}
+        self._quota_images = quota_images
+        self._quota_bytes = quota_bytes
+        self._quota_window = timedelta(seconds=quota_window_seconds)
         self._lock = threading.Lock()
+        self._stop = threading.Event()
         
         # Start cleanup thread
         self._cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
@@ -38,9 +49,59 @@ class SessionStore:
             if session_id in self._sessions:
                 self._sessions[session_id].status = "used"
 
+    def _current_usage(self, editor_session_id: str, now: datetime) -> UploadUsage:
+        # Called with the lock held
+        usage = self._usage.get(editor_session_id)
+        if not usage or usage.windowStart + self._quota_window < now:
+            usage = UploadUsage(editorSessionId=editor_session_id, windowStart=now)
+        return usage
+
+    def _fits_quota(self, usage: UploadUsage, size_bytes: int) -> bool:
+        return usage.images + 1 <= self._quota_images and usage.sizeBytes + size_bytes <= self._quota_bytes
+
+    def has_quota(self, editor_session_id: str, size_bytes: int) -> bool:
+        """
+        Checks the quota without counting the upload, so work can be
+        skipped before it is known whether the upload succeeds.
+        """
+        with self._lock:
+            return self._fits_quota(self._current_usage(editor_session_id, datetime.utcnow()), size_bytes)
+
+    def reserve_upload(self, editor_session_id: str, size_bytes: int) -> bool:
+        """
+        Counts an upload against the editor session's quota.
+
+        Returns:
+            bool: False if the upload would exceed the image or byte quota.
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            usage = self._current_usage(editor_session_id, now)
+            if not self._fits_quota(usage, size_bytes):
+                return False
+            usage.images += 1
+            usage.sizeBytes += size_bytes
+            self._usage[editor_session_id] = usage
+            return True
+
+    def get_usage(self, editor_session_id: str) -> Optional[UploadUsage]:
+        with self._lock:
+            usage = self._usage.get(editor_session_id)
+            return usage.copy() if usage else None
+
+    def active_count(self) -> int:
+        now = datetime.utcnow()
+        with self._lock:
+            return sum(
+                1 for s in self._sessions.values()
+                if s.expiresAt >= now and s.status == "active"
+            )
+
+    def close(self):
+        self._stop.set()
+
     def _cleanup_loop(self):
-        while True:
-            time.sleep(60) # Cleanup every minute
+        while not self._stop.wait(60): # Cleanup every minute
             now = datetime.utcnow()
             with self._lock:
                 expired_ids = [
@@ -50,4 +111,9 @@ class SessionStore:
                 for sid in expired_ids:
                     del self._sessions[sid]
 
-session_store = SessionStore()
+                expired_usage = [
+                    eid for eid, u in self._usage.items()
+                    if u.windowStart + self._quota_window < now
+                ]
+                for eid in expired_usage:
+                    del self._usage[eid]
@@ -2,6 +2,7 @@ from fastapi import WebSocket
 from typing import Dict, Set
 import json
 from models.upload_models import WSMessage
+from services.metrics import timed, PAYLOAD_BYTES
 
 class WSHub:
     def __init__(self):
@@ -19,10 +20,15 @@ class WSHub:
             if not self._connections[editor_session_id]:
                 del self._connections[editor_session_id]
 
+    def connection_count(self) -> int:
+        return sum(len(sockets) for sockets in self._connections.values())
+
+    @timed("ws_broadcast")
     async def broadcast(self, editor_session_id: str, message: WSMessage):
         if editor_session_id in self._connections:
             disconnected_sockets = set()
             payload_json = message.json()
+            PAYLOAD_BYTES.observe(len(payload_json), kind="ws_message")
             for websocket in self._connections[editor_session_id]:
                 try:
                     await websocket.send_text(payload_json)
@@ -31,5 +37,3 @@ class WSHub:
             
             for ws in disconnected_sockets:
                 self.disconnect(editor_session_id, ws)
-
-ws_hub = WSHub()
@@ -0,0 +1,77 @@
+import json
+import zipfile
+import io
+from fastapi.testclient import TestClient
+from PIL import Image
+from main import app
+
+client = TestClient(app)
+
+def make_report(title, image_name):
+    return {
+        "title": title,
+        "author": "Tester",
+        "cells": [
+            {"id": "1", "type": "text", "content": f"{title} body"},
+            {"id": "2", "type": "image", "mode": "gallery", "content": image_name}
+        ],
+        "sections": []
+    }
+
+def test_batch_export():
+    print("\n--- Testing Batch Export ---")
+    img = Image.new('RGB', (20, 20), color='blue')
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='PNG')
+
+    # Both reports share the same uploaded image
+    reports = [make_report("Student A", "shared.png"), make_report("Student B", "shared.png")]
+    files = [("files", ("shared.png", img_byte_arr.getvalue(), "image/png"))]
+
+    resp = client.post("/generate-zip/batch", data={"reports_json": json.dumps(reports)}, files=files)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as outer:
+        names = sorted(outer.namelist())
+        assert names == ["001_Student_A_Report.zip", "002_Student_B_Report.zip"]
+        for name, title in zip(names, ["Student A", "Student B"]):
+            with zipfile.ZipFile(io.BytesIO(outer.read(name))) as inner:
+                tex = inner.read("main.tex").decode("utf-8")
+                assert f"{title} body" in tex
+                assert "images/img_001.png" in inner.namelist()
+    print("--- Batch Export Test Passed ---\n")
+
+def png_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (20, 20), color=color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def test_batch_reports_keep_their_own_files():
+    print("\n--- Testing Per-Report Batch Files ---")
+    # Two students upload different images under the same filename
+    reports = [make_report("Student Red", "figure.png"), make_report("Student Blue", "figure.png")]
+    files = [
+        ("files_1", ("figure.png", png_bytes("red"), "image/png")),
+        ("files_2", ("figure.png", png_bytes("blue"), "image/png")),
+    ]
+
+    resp = client.post("/generate-zip/batch", data={"reports_json": json.dumps(reports)}, files=files)
+    assert resp.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as outer:
+        colors = {}
+        for name in outer.namelist():
+            with zipfile.ZipFile(io.BytesIO(outer.read(name))) as inner:
+                img = Image.open(io.BytesIO(inner.read("images/img_001.png"))).convert("RGB")
+                colors[name] = img.getpixel((10, 10))
+
+    red = colors["001_Student_Red_Report.zip"]
+    blue = colors["002_Student_Blue_Report.zip"]
+    assert red[0] > 200 and red[2] < 60
+    assert blue[2] > 200 and blue[0] < 60
+    print("--- Per-Report Batch Files Test Passed ---\n")
+
+if __name__ == "__main__":
+    test_batch_export()
+    test_batch_reports_keep_their_own_files()
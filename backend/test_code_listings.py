@@ -0,0 +1,72 @@
+import json
+import zipfile
+import io
+from fastapi.testclient import TestClient
+from main import app
+from services.container import services
+
+client = TestClient(app)
+
+def test_large_code_cells_use_external_listings():
+    print("\n--- Testing External Code Listings ---")
+
+    big_code = "print('line')\n" * (services.settings.code_inline_max_bytes // 10)
+    report_data = {
+        "title": "Listing Test",
+        "author": "Tester",
+        "cells": [
+            {"id": "small", "type": "code", "content": "x = 1"},
+            {"id": "big", "type": "code", "content": big_code},
+            {"id": "big_copy", "type": "code", "content": big_code}
+        ],
+        "sections": []
+    }
+
+    resp = client.post("/generate-zip", data={"report_json": json.dumps(report_data)})
+    assert resp.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        names = zf.namelist()
+        tex = zf.read("main.tex").decode("utf-8")
+
+        # Identical listings share one file
+        code_entries = [n for n in names if n.startswith("code/")]
+        assert code_entries == ["code/cell_big.txt"]
+        assert zf.read("code/cell_big.txt").decode("utf-8") == big_code
+
+    assert tex.count("\\lstinputlisting{code/cell_big.txt}") == 2
+    assert "\\begin{lstlisting}\nx = 1\n\\end{lstlisting}" in tex
+    assert big_code not in tex
+    print("--- External Code Listings Test Passed ---\n")
+
+def test_listing_names_do_not_collide():
+    print("\n--- Testing Listing Name Collisions ---")
+
+    first = "X = 1\n" * services.settings.code_inline_max_bytes
+    second = "Y = 2\n" * services.settings.code_inline_max_bytes
+    report_data = {
+        "title": "Collision Test",
+        "author": "Tester",
+        # Both ids sanitise to cell_a_b
+        "cells": [
+            {"id": "a.b", "type": "code", "content": first},
+            {"id": "a_b", "type": "code", "content": second}
+        ],
+        "sections": []
+    }
+
+    resp = client.post("/generate-zip", data={"report_json": json.dumps(report_data)})
+    assert resp.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        tex = zf.read("main.tex").decode("utf-8")
+        assert zf.read("code/cell_a_b.txt").decode("utf-8") == first
+        assert zf.read("code/cell_a_b_2.txt").decode("utf-8") == second
+
+    assert "\\lstinputlisting{code/cell_a_b.txt}" in tex
+    assert "\\lstinputlisting{code/cell_a_b_2.txt}" in tex
+    print("--- Listing Name Collisions Test Passed ---\n")
+
+if __name__ == "__main__":
+    test_large_code_cells_use_external_listings()
+    test_listing_names_do_not_collide()
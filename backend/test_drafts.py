@@ -0,0 +1,120 @@
+import io
+import os
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from main import app
+from models.draft_models import DraftSave, DraftLayout
+from models.upload_models import AssetMeta
+from services.asset_store import AssetStore
+from services.draft_store import DraftStore, DraftTooLarge
+
+client = TestClient(app)
+
+def test_draft_save_patch_restore():
+    print("\n--- Testing Server-Side Drafts ---")
+    editor_session_id = str(uuid.uuid4())
+
+    # 1. Upload an image once, reference it by asset id
+    img = Image.new('RGB', (40, 40), color='green')
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='PNG')
+    resp = client.post(
+        f"/drafts/{editor_session_id}/images",
+        files={'file': ('figure.png', img_byte_arr.getvalue(), 'image/png')}
+    )
+    assert resp.status_code == 200
+    asset_id = resp.json()["assetId"]
+
+    # 2. Full save
+    layout = {
+        "canvasCellIds": ["c1"],
+        "sections": [{"id": "s1", "title": "Intro", "subsections": [
+            {"id": "sub1", "title": "Overview", "cellIds": ["c2", "c3"]}
+        ]}]
+    }
+    resp = client.put(f"/drafts/{editor_session_id}", json={
+        "title": "Draft",
+        "author": "Tester",
+        "layout": layout,
+        "cells": {
+            "c1": {"id": "c1", "type": "text", "content": "Hello"},
+            "c2": {"id": "c2", "type": "code", "content": "x = 1"},
+            "c3": {"id": "c3", "type": "image", "mode": "gallery", "asset_id": asset_id}
+        }
+    })
+    assert resp.status_code == 200
+    revision = resp.json()["revision"]
+
+    # 3. Incremental save: one changed cell, one deleted via the layout
+    layout["sections"][0]["subsections"][0]["cellIds"] = ["c3"]
+    resp = client.patch(f"/drafts/{editor_session_id}", json={
+        "baseRevision": revision,
+        "layout": layout,
+        "cells": {"c1": {"id": "c1", "type": "text", "content": "Hello again"}}
+    })
+    assert resp.status_code == 200
+    assert resp.json()["revision"] == revision + 1
+
+    # 4. Stale patches are rejected
+    resp = client.patch(f"/drafts/{editor_session_id}", json={"baseRevision": revision, "title": "Old"})
+    assert resp.status_code == 409
+
+    # 5. Restore
+    resp = client.get(f"/drafts/{editor_session_id}")
+    assert resp.status_code == 200
+    draft = resp.json()
+    assert draft["title"] == "Draft"
+    assert draft["cells"]["c1"]["content"] == "Hello again"
+    assert draft["cells"]["c3"]["asset_id"] == asset_id
+    assert "c2" not in draft["cells"]
+    print("--- Server-Side Drafts Test Passed ---\n")
+
+def make_save(content):
+    return DraftSave(
+        title="Draft",
+        layout=DraftLayout(canvasCellIds=["c1"]),
+        cells={"c1": {"id": "c1", "type": "text", "content": content}}
+    )
+
+def test_draft_store_limits_and_persistence(tmp_path):
+    print("\n--- Testing Draft Limits and Persistence ---")
+    store = DraftStore(storage_dir=str(tmp_path), max_cached=1, max_draft_bytes=4096)
+    store.save_draft("a", make_save("first"))
+    store.save_draft("b", make_save("second"))
+
+    # Only one draft stays in memory, the other is read back from disk
+    assert store.cached_count() == 1
+    assert store.get_draft("a").cells["c1"]["content"] == "first"
+
+    # A new store (e.g. after a restart) sees the same drafts
+    restarted = DraftStore(storage_dir=str(tmp_path))
+    assert restarted.get_draft("b").cells["c1"]["content"] == "second"
+
+    # Oversized drafts are rejected and leave the saved one untouched
+    with pytest.raises(DraftTooLarge):
+        store.save_draft("a", make_save("x" * 8192))
+    assert store.get_draft("a").revision == 1
+
+    # Expired drafts are deleted
+    expiring = DraftStore(storage_dir=str(tmp_path), ttl_seconds=0)
+    assert expiring.get_draft("a") is None
+    assert not os.path.exists(expiring._path("a"))
+    print("--- Draft Limits and Persistence Test Passed ---\n")
+
+def test_asset_metadata_survives_restart(tmp_path):
+    print("\n--- Testing Asset Metadata Persistence ---")
+    store = AssetStore(storage_dir=str(tmp_path))
+    meta = AssetMeta(width=1, height=1, sizeBytes=3, mimeType="image/jpeg")
+    asset = store.store_asset(b"abc", "figure.jpg", meta)
+
+    restarted = AssetStore(storage_dir=str(tmp_path))
+    assert restarted.get_asset_path(asset.assetId) == asset.pathOrKey
+    # Stored bytes are counted from disk, not only from this process's writes
+    assert restarted.total_bytes() == 3
+    assert restarted.get_asset("../etc") is None
+    print("--- Asset Metadata Persistence Test Passed ---\n")
+
+if __name__ == "__main__":
+    test_draft_save_patch_restore()
@@ -0,0 +1,90 @@
+import json
+import zipfile
+import io
+from fastapi.testclient import TestClient
+from PIL import Image
+from main import app
+
+client = TestClient(app)
+
+def make_png(width, height):
+    img = Image.new('RGBA', (width, height), color=(255, 0, 0, 128))
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def report_json(image_policy):
+    return json.dumps({
+        "title": "Normalize Test",
+        "author": "Tester",
+        "cells": [{"id": "1", "type": "image", "mode": "gallery", "content": "large.png"}],
+        "sections": [],
+        "image_policy": image_policy
+    })
+
+def test_desktop_images_are_normalized():
+    print("\n--- Testing Desktop Image Normalization ---")
+    original = make_png(3000, 1000)
+    files = [("files", ("large.png", original, "image/png"))]
+
+    resp = client.post(
+        "/generate-zip",
+        data={"report_json": report_json({"max_dimension": 600, "format": "jpeg", "keep_originals": True})},
+        files=files
+    )
+    assert resp.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        names = zf.namelist()
+        tex = zf.read("main.tex").decode("utf-8")
+        assert "images/img_001.jpg" in names
+        assert zf.read("images/originals/img_001.png") == original
+        img = Image.open(io.BytesIO(zf.read("images/img_001.jpg")))
+        assert img.format == "JPEG"
+        assert img.size == (600, 200)
+        # Half-transparent red is flattened onto white, not black
+        r, g, b = img.convert("RGB").getpixel((300, 100))
+        assert r > 240 and 110 < g < 145 and 110 < b < 145
+
+    assert "images/img_001.jpg" in tex
+    print("--- Desktop Image Normalization Test Passed ---\n")
+
+def test_png_stays_png_by_default():
+    print("\n--- Testing Default PNG Normalization ---")
+    files = [("files", ("large.png", make_png(3000, 1000), "image/png"))]
+
+    resp = client.post("/generate-zip", data={"report_json": report_json({"max_dimension": 600})}, files=files)
+    assert resp.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        img = Image.open(io.BytesIO(zf.read("images/img_001.png")))
+        assert img.format == "PNG"
+        assert img.size == (600, 200)
+        # Transparency is kept
+        assert img.getpixel((300, 100))[3] == 128
+    print("--- Default PNG Normalization Test Passed ---\n")
+
+def test_normalization_can_be_disabled():
+    print("\n--- Testing Normalization Opt-Out ---")
+    original = make_png(50, 50)
+    files = [("files", ("large.png", original, "image/png"))]
+
+    resp = client.post(
+        "/generate-zip",
+        data={"report_json": report_json({"normalize": False})},
+        files=files
+    )
+    assert resp.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        assert zf.read("images/img_001.png") == original
+    print("--- Normalization Opt-Out Test Passed ---\n")
+
+def test_unknown_image_format_is_rejected():
+    print("\n--- Testing Image Format Validation ---")
+    resp = client.post("/generate-zip", data={"report_json": report_json({"format": "gif"})})
+    assert resp.status_code == 422
+    for policy in ({"max_dimension": 0}, {"quality": 0}, {"quality": 100}):
+        resp = client.post("/generate-zip", data={"report_json": report_json(policy)})
+        assert resp.status_code == 422
+    print("--- Image Format Validation Test Passed ---\n")
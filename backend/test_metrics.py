@@ -0,0 +1,48 @@
+import json
+from fastapi.testclient import TestClient
+from main import app
+from services.container import services
+from services.metrics import STAGE_SECONDS
+
+client = TestClient(app)
+
+def test_metrics_endpoint():
+    print("\n--- Testing Metrics Endpoint ---")
+
+    report_data = {
+        "title": "Metrics Test",
+        "author": "Tester",
+        "cells": [{"id": "1", "type": "text", "content": "Hello"}],
+        "sections": []
+    }
+    resp = client.post("/generate-zip", data={"report_json": json.dumps(report_data)})
+    assert resp.status_code == 200
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+
+    body = resp.text
+    assert "# TYPE report_stage_duration_seconds histogram" in body
+    assert 'report_stage_duration_seconds_count{stage="render_cell"}' in body
+    assert 'report_stage_duration_seconds_count{stage="create_report_zip"}' in body
+    assert 'report_payload_size_bytes_count{kind="report_zip"}' in body
+    assert "upload_sessions_active " in body
+    assert "websocket_connections " in body
+    assert "asset_store_bytes " in body
+    print("--- Metrics Endpoint Test Passed ---\n")
+
+def test_metrics_can_be_disabled_at_runtime(monkeypatch):
+    print("\n--- Testing Disabled Metrics ---")
+    monkeypatch.setattr(services.settings, "metrics_enabled", False)
+    before = STAGE_SECONDS.samples()
+
+    report_data = {"title": "Off", "author": "Tester", "cells": [], "sections": []}
+    resp = client.post("/generate-zip", data={"report_json": json.dumps(report_data)})
+    assert resp.status_code == 200
+    assert STAGE_SECONDS.samples() == before
+    assert client.get("/metrics").status_code == 404
+    print("--- Disabled Metrics Test Passed ---\n")
+
+if __name__ == "__main__":
+    test_metrics_endpoint()
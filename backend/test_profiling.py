@@ -0,0 +1,86 @@
+import io
+import json
+import os
+import random
+from fastapi.testclient import TestClient
+from PIL import Image
+from main import app
+from services.container import services
+
+client = TestClient(app)
+
+REPORT_JSON = json.dumps({
+    "title": "Profile Test",
+    "author": "Tester",
+    "cells": [{"id": "1", "type": "code", "content": "print('hi')"}],
+    "sections": []
+})
+
+def test_profiled_generate_zip(monkeypatch, tmp_path):
+    print("\n--- Testing Per-Request Profiling ---")
+    monkeypatch.setattr(services.settings, "profile_admin_token", "secret")
+    monkeypatch.setattr(services.settings, "profile_output_dir", str(tmp_path))
+
+    # Requests without a token are not profiled
+    resp = client.post("/generate-zip", data={"report_json": REPORT_JSON})
+    assert resp.status_code == 200
+    assert "server-timing" not in resp.headers
+
+    # A wrong token is rejected
+    resp = client.post("/generate-zip?profile_token=wrong", data={"report_json": REPORT_JSON})
+    assert resp.status_code == 403
+
+    resp = client.post(
+        "/generate-zip",
+        data={"report_json": REPORT_JSON},
+        headers={"X-Profile-Token": "secret"}
+    )
+    assert resp.status_code == 200
+    server_timing = resp.headers["server-timing"]
+    assert "process_cells;dur=" in server_timing
+    assert "render_cell;dur=" in server_timing
+    assert "create_report_zip;dur=" in server_timing
+    assert "total;dur=" in server_timing
+
+    profile_file = resp.headers["x-profile-file"]
+    assert os.path.exists(os.path.join(str(tmp_path), profile_file))
+    print("--- Per-Request Profiling Test Passed ---\n")
+
+def test_profiled_stages_include_worker_threads(monkeypatch, tmp_path):
+    print("\n--- Testing Profiling Across Threads ---")
+    monkeypatch.setattr(services.settings, "profile_admin_token", "secret")
+    monkeypatch.setattr(services.settings, "profile_output_dir", str(tmp_path))
+
+    # A fresh colour so the image is not served from the normalization cache
+    img = Image.new("RGB", (40, 40), color=tuple(random.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    report = {
+        "title": "Thread Test",
+        "author": "Tester",
+        "cells": [{"id": "1", "type": "image", "mode": "gallery", "content": "fig.png"}],
+        "sections": []
+    }
+    files = [("files", ("fig.png", buffer.getvalue(), "image/png"))]
+
+    resp = client.post(
+        "/generate-zip",
+        data={"report_json": json.dumps(report)},
+        files=files,
+        headers={"X-Profile-Token": "secret"}
+    )
+    assert resp.status_code == 200
+    # process_image runs on the normalization thread pool
+    assert "process_image;dur=" in resp.headers["server-timing"]
+
+    # The batch body is streamed, its stages still reach the header
+    resp = client.post(
+        "/generate-zip/batch",
+        data={"reports_json": json.dumps([report])},
+        files=files,
+        headers={"X-Profile-Token": "secret"}
+    )
+    assert resp.status_code == 200
+    assert "create_report_zip;dur=" in resp.headers["server-timing"]
+    assert resp.content.startswith(b"PK")
+    print("--- Profiling Across Threads Test Passed ---\n")
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import uuid
+from fastapi.testclient import TestClient
+from main import app
+from services.container import services
+from services.fair_queue import FairWorkQueue
+from services.rate_limiter import TokenBucketLimiter
+from services.session_store import SessionStore
+
+client = TestClient(app)
+
+def test_token_bucket_refills():
+    now = [0.0]
+    limiter = TokenBucketLimiter(rate_per_second=1, burst=2, clock=lambda: now[0])
+
+    assert limiter.acquire(["a"]) == 0
+    assert limiter.acquire(["a"]) == 0
+    assert limiter.acquire(["a"]) > 0
+    # Other keys have their own bucket, but a request needs every key
+    assert limiter.acquire(["b"]) == 0
+    assert limiter.acquire(["a", "b"]) > 0
+
+    now[0] = 1.0
+    assert limiter.acquire(["a"]) == 0
+
+def test_upload_quota():
+    store = SessionStore(quota_images=2, quota_bytes=100)
+    try:
+        assert store.reserve_upload("editor", 40)
+        assert not store.reserve_upload("editor", 70)
+        assert store.reserve_upload("editor", 60)
+        assert not store.reserve_upload("editor", 1)
+        assert store.reserve_upload("other", 100)
+    finally:
+        store.close()
+
+def test_fair_queue_round_robin():
+    queue = FairWorkQueue(workers=1)
+    gate = threading.Event()
+    order = []
+
+    def job(name):
+        if name == "a1":
+            gate.wait(5)
+        order.append(name)
+
+    async def run():
+        tasks = [asyncio.create_task(queue.run("a", job, "a1"))]
+        await asyncio.sleep(0.05)
+        tasks += [asyncio.create_task(queue.run("a", job, name)) for name in ("a2", "a3")]
+        tasks.append(asyncio.create_task(queue.run("b", job, "b1")))
+        await asyncio.sleep(0.05)
+        gate.set()
+        await asyncio.gather(*tasks)
+
+    try:
+        asyncio.run(run())
+    finally:
+        queue.close()
+    assert order == ["a1", "a2", "b1", "a3"]
+
+def test_upload_sessions_are_rate_limited(monkeypatch):
+    print("\n--- Testing Upload Rate Limits ---")
+    monkeypatch.setitem(services._instances, "upload_rate_limiter", TokenBucketLimiter(rate_per_second=0.01, burst=2))
+    editor_session_id = str(uuid.uuid4())
+
+    for _ in range(2):
+        resp = client.post("/upload-sessions", json={"editorSessionId": editor_session_id, "targetCellId": "c1"})
+        assert resp.status_code == 200
+
+    resp = client.post("/upload-sessions", json={"editorSessionId": editor_session_id, "targetCellId": "c1"})
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) > 0
+    print("--- Upload Rate Limits Test Passed ---\n")
+
+def test_rate_limits_are_per_editor_session(monkeypatch):
+    print("\n--- Testing Per-Session Rate Limits ---")
+    monkeypatch.setitem(services._instances, "upload_rate_limiter", TokenBucketLimiter(rate_per_second=0.01, burst=1))
+
+    # Without trusted client addresses, one busy session does not block others
+    # that reach the backend through the same proxy
+    for _ in range(3):
+        resp = client.post("/upload-sessions", json={"editorSessionId": str(uuid.uuid4()), "targetCellId": "c1"})
+        assert resp.status_code == 200
+
+    # Draft image uploads are limited too
+    editor_session_id = str(uuid.uuid4())
+    statuses = [
+        client.post(
+            f"/drafts/{editor_session_id}/images",
+            files={"file": ("bad.png", b"not an image", "image/png")}
+        ).status_code
+        for _ in range(2)
+    ]
+    assert statuses == [400, 429]
+    print("--- Per-Session Rate Limits Test Passed ---\n")
+
+def test_failed_uploads_do_not_use_quota():
+    print("\n--- Testing Quota on Failed Uploads ---")
+    editor_session_id = str(uuid.uuid4())
+    resp = client.post("/upload-sessions", json={"editorSessionId": editor_session_id, "targetCellId": "c1"})
+    session_id = resp.json()["sessionId"]
+
+    resp = client.post(
+        f"/upload-sessions/{session_id}/image",
+        files={"file": ("bad.jpg", b"not an image", "image/jpeg")}
+    )
+    assert resp.status_code == 400
+    assert services.session_store.get_usage(editor_session_id) is None
+    print("--- Quota on Failed Uploads Test Passed ---\n")
@@ -0,0 +1,110 @@
+import json
+import uuid
+import zipfile
+import io
+from fastapi.testclient import TestClient
+import main
+import latex.cell_renderer as cell_renderer
+from main import app
+
+client = TestClient(app)
+
+def test_split_sections_export():
+    print("\n--- Testing Split Section Export ---")
+
+    report_data = {
+        "title": "Split Test",
+        "author": "Tester",
+        "split_sections": True,
+        "sections": [
+            {
+                "id": f"s{i}",
+                "title": f"Section {i}",
+                "subsections": [
+                    {
+                        "id": f"sub{i}",
+                        "title": "Sub",
+                        "cells": [{"id": f"c{i}", "type": "text", "content": f"Body {i}"}]
+                    }
+                ]
+            }
+            for i in range(1, 4)
+        ]
+    }
+
+    resp = client.post("/generate-zip", data={"report_json": json.dumps(report_data)})
+    assert resp.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        names = zf.namelist()
+        tex = zf.read("main.tex").decode("utf-8")
+        for i in range(1, 4):
+            assert f"sections/sec_{i:02d}.tex" in names
+            assert f"\\include{{sections/sec_{i:02d}}}" in tex
+            section_tex = zf.read(f"sections/sec_{i:02d}.tex").decode("utf-8")
+            assert f"\\section{{Section {i}}}" in section_tex
+            assert f"Body {i}" in section_tex
+
+    assert "Body 1" not in tex
+    print("--- Split Section Export Test Passed ---\n")
+
+def test_unchanged_sections_come_from_render_cache(monkeypatch):
+    print("\n--- Testing Section Render Cache ---")
+    rendered_sections = []
+    rendered_cells = []
+    render_section = main.render_section
+    render_cell = cell_renderer.render_cell
+
+    def counting_render_section(section, *args):
+        rendered_sections.append(section.title)
+        return render_section(section, *args)
+
+    def counting_render_cell(cell, *args):
+        rendered_cells.append(cell.id)
+        return render_cell(cell, *args)
+
+    monkeypatch.setattr(main, "render_section", counting_render_section)
+    monkeypatch.setattr(cell_renderer, "render_cell", counting_render_cell)
+
+    # Unique content so earlier tests cannot have filled the cache
+    run_id = uuid.uuid4().hex
+    report_data = {
+        "title": "Cache Test",
+        "author": "Tester",
+        "sections": [
+            {
+                "id": f"s{i}",
+                "title": f"Section {i} {run_id}",
+                "subsections": [
+                    {"id": f"sub{i}", "title": "Sub", "cells": [{"id": f"c{i}", "type": "text", "content": f"Body {i}"}]}
+                ]
+            }
+            for i in range(1, 4)
+        ]
+    }
+
+    def export():
+        resp = client.post("/generate-zip", data={"report_json": json.dumps(report_data)})
+        assert resp.status_code == 200
+        return zipfile.ZipFile(io.BytesIO(resp.content)).read("main.tex").decode("utf-8")
+
+    first = export()
+    assert len(rendered_sections) == 3
+
+    # Same report again: nothing is rendered
+    rendered_sections.clear()
+    rendered_cells.clear()
+    assert export() == first
+    assert rendered_sections == []
+    assert rendered_cells == []
+
+    # Changing one section re-renders only that section
+    report_data["sections"][1]["subsections"][0]["cells"][0]["content"] = "Changed"
+    tex = export()
+    assert rendered_sections == [f"Section 2 {run_id}"]
+    assert rendered_cells == ["c2"]
+    assert "Changed" in tex and "Body 1" in tex
+    print("--- Section Render Cache Test Passed ---\n")
+
+if __name__ == "__main__":
+    test_split_sections_export()
@@ -0,0 +1,64 @@
+import json
+from urllib.parse import urlencode
+import zipfile
+import io
+from fastapi.testclient import TestClient
+from main import app
+from services.container import services
+
+client = TestClient(app)
+
+REPORT_JSON = json.dumps({
+    "title": "Limits Test",
+    "author": "Tester",
+    "cells": [{"id": "1", "type": "image", "mode": "gallery", "content": "used.png"}],
+    "sections": []
+})
+
+def test_unreferenced_files_are_dropped():
+    print("\n--- Testing Unreferenced Upload Handling ---")
+    files = [
+        ("files", ("used.png", b"used-bytes", "image/png")),
+        ("files", ("unused.png", b"unused-bytes", "image/png")),
+    ]
+    resp = client.post("/generate-zip", data={"report_json": REPORT_JSON}, files=files)
+    assert resp.status_code == 200
+
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        assert zf.read("images/img_001.png") == b"used-bytes"
+        assert len([n for n in zf.namelist() if n.startswith("images/")]) == 1
+    print("--- Unreferenced Upload Handling Test Passed ---\n")
+
+def test_upload_limits_return_413(monkeypatch):
+    print("\n--- Testing Upload Size Limits ---")
+    monkeypatch.setattr(services.settings, "upload_max_file_bytes", 1024)
+    files = [("files", ("used.png", b"x" * 2048, "image/png"))]
+    resp = client.post("/generate-zip", data={"report_json": REPORT_JSON}, files=files)
+    assert resp.status_code == 413
+
+    # Unreferenced parts count towards the limits too
+    files = [("files", ("unused.png", b"x" * 2048, "image/png"))]
+    resp = client.post("/generate-zip", data={"report_json": REPORT_JSON}, files=files)
+    assert resp.status_code == 413
+
+    monkeypatch.setattr(services.settings, "upload_max_file_bytes", 1024 * 1024)
+    monkeypatch.setattr(services.settings, "upload_max_total_bytes", 4096)
+    files = [("files", ("used.png", b"x" * 8192, "image/png"))]
+    resp = client.post("/generate-zip", data={"report_json": REPORT_JSON}, files=files)
+    assert resp.status_code == 413
+
+    # Form bodies without Content-Length are capped while streaming
+    monkeypatch.setattr(services.settings, "upload_max_total_bytes", 4096)
+    body = urlencode({"report_json": REPORT_JSON, "padding": "x" * 20000}).encode("utf-8")
+
+    def chunks():
+        for start in range(0, len(body), 1024):
+            yield body[start:start + 1024]
+
+    resp = client.post(
+        "/generate-zip",
+        content=chunks(),
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert resp.status_code == 413
+    print("--- Upload Size Limits Test Passed ---\n")
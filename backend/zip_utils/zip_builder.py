@@ -1,14 +1,25 @@
 import io
 import zipfile
-from typing import Dict, Tuple
+from typing import Dict, Optional
+from services.metrics import timed
 
-def create_report_zip(latex_content: str, images: Dict[str, bytes]) -> bytes:
+@timed("create_report_zip")
+def create_report_zip(
+    latex_content: str,
+    images: Dict[str, bytes],
+    code_files: Optional[Dict[str, bytes]] = None,
+    section_files: Optional[Dict[str, str]] = None
+) -> bytes:
     """
-    Creates a ZIP file containing main.tex and an images directory.
+    Creates a ZIP file containing main.tex, an images directory and,
+    optionally, code and sections directories for external listings
+    and per-section files.
     
     Args:
         latex_content: The full content of the main.tex file.
         images: A dictionary where key is filename and value is file bytes.
+        code_files: A dictionary where key is filename and value is listing bytes.
+        section_files: A dictionary where key is filename and value is LaTeX source.
         
     Returns:
         bytes: The ZIP file content.
@@ -22,5 +33,58 @@ def create_report_zip(latex_content: str, images: Dict[str, bytes]) -> bytes:
         # Write images
         for filename, content in images.items():
             zip_file.writestr(f"images/{filename}", content)
+
+        # Write external code listings
+        for filename, content in (code_files or {}).items():
+            zip_file.writestr(f"code/{filename}", content)
+
+        # Write per-section files
+        for filename, content in (section_files or {}).items():
+            zip_file.writestr(f"sections/{filename}", content)
             
     return zip_buffer.getvalue()
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    Write-only, non-seekable sink that collects ZIP output until drained.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class ZipStreamWriter:
+    """
+    Builds a ZIP archive incrementally so it can be streamed to the client
+    while later entries are still being produced.
+
+    Entries are stored without compression since they are usually report
+    ZIPs that are already compressed.
+    """
+    def __init__(self):
+        self._buffer = _ChunkBuffer()
+        self._zip_file = zipfile.ZipFile(self._buffer, "w", zipfile.ZIP_STORED)
+
+    def add(self, filename: str, content: bytes) -> bytes:
+        """
+        Adds an entry and returns the archive bytes produced so far.
+        """
+        self._zip_file.writestr(filename, content)
+        return self._buffer.drain()
+
+    def close(self) -> bytes:
+        """
+        Writes the central directory and returns the remaining bytes.
+        """
+        self._zip_file.close()
+        return self._buffer.drain()
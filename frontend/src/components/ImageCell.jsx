@@ -25,7 +25,7 @@ export default function ImageCell({ cell, updateCell }) {
 
     const handleModeChange = (mode) => {
         // Clear file/asset if moving to placeholder
-        updateCell(cell.id, { mode, file_obj: null, asset_id: null, asset_url: null, content: "" });
+        updateCell(cell.id, { mode, file_obj: null, asset_id: null, asset_url: null, asset_missing: false, content: "" });
     };
 
     const handleFileChange = (e) => {
@@ -36,7 +36,8 @@ export default function ImageCell({ cell, updateCell }) {
                 file_obj: file,
                 content: file.name,
                 asset_id: null,
-                asset_url: null
+                asset_url: null,
+                asset_missing: false
             });
         }
     };
@@ -128,7 +129,9 @@ export default function ImageCell({ cell, updateCell }) {
                         </div>
                     ) : (
                         <div className="text-sm text-gray-500 italic p-2 border border-dashed text-center">
-                            No image selected
+                            {cell.asset_missing
+                                ? "This image is no longer available on the server, please upload it again"
+                                : "No image selected"}
                         </div>
                     )
                 )}
@@ -27,3 +27,56 @@ export const uploadMobileImage = async (sessionId, file) => {
     if (!response.ok) throw new Error('Upload failed');
     return response.json();
 };
+
+export const getDraft = async (editorSessionId) => {
+    const response = await fetch(`${BACKEND_URL}/drafts/${editorSessionId}`);
+    if (response.status === 404) return null;
+    if (!response.ok) throw new Error('Failed to load draft');
+    return response.json();
+};
+
+export const saveDraft = async (editorSessionId, draft) => {
+    const response = await fetch(`${BACKEND_URL}/drafts/${editorSessionId}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(draft),
+    });
+    if (!response.ok) throw new Error('Failed to save draft');
+    return response.json();
+};
+
+// Resolves to null when the server draft moved on and a full save is needed
+export const patchDraft = async (editorSessionId, patch) => {
+    const response = await fetch(`${BACKEND_URL}/drafts/${editorSessionId}`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(patch),
+    });
+    if (response.status === 404 || response.status === 409) return null;
+    if (!response.ok) throw new Error('Failed to save draft');
+    return response.json();
+};
+
+export const uploadDraftImage = async (editorSessionId, file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    const response = await fetch(`${BACKEND_URL}/drafts/${editorSessionId}/images`, {
+        method: 'POST',
+        body: formData,
+    });
+    if (!response.ok) {
+        const error = new Error('Image upload failed');
+        error.status = response.status;
+        // Seconds to wait when rate limited (429)
+        error.retryAfter = Number(response.headers.get('Retry-After')) || null;
+        throw error;
+    }
+    return response.json();
+};
+
+// Assets live on the backend disk and can disappear, e.g. after a redeploy
+export const assetExists = async (assetUrl) => {
+    const response = await fetch(`${BACKEND_URL}${assetUrl}`, { method: 'HEAD' });
+    return response.ok;
+};
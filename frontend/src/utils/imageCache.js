@@ -0,0 +1,44 @@
+// Local copies of uploaded draft images, kept in IndexedDB (which stores
+// Blobs without the localStorage quota) so a draft can still be restored
+// if the server lost its assets, e.g. after a restart.
+const DB_NAME = 'lab_report_images';
+const STORE_NAME = 'images';
+
+let dbPromise = null;
+
+const openDb = () => {
+    if (!dbPromise) {
+        dbPromise = new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(STORE_NAME);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return dbPromise;
+};
+
+const run = async (mode, action) => {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(STORE_NAME, mode);
+        const request = action(tx.objectStore(STORE_NAME));
+        tx.oncomplete = () => resolve(request && request.result);
+        tx.onerror = () => reject(tx.error);
+    });
+};
+
+export const saveLocalImage = (assetId, file) => run('readwrite', store => store.put(file, assetId));
+
+export const loadLocalImage = (assetId) => run('readonly', store => store.get(assetId));
+
+// Drop copies of images no longer used by the draft
+export const pruneLocalImages = async (keepAssetIds) => {
+    const keys = await run('readonly', store => store.getAllKeys());
+    const stale = keys.filter(key => !keepAssetIds.has(key));
+    if (stale.length) {
+        await run('readwrite', store => {
+            stale.forEach(key => store.delete(key));
+        });
+    }
+};
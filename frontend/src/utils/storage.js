@@ -1,66 +1,160 @@
+import { getDraft, saveDraft, patchDraft, uploadDraftImage, assetExists } from '../lib/api';
+import { getEditorSessionId } from './editorSession';
+import { saveLocalImage, loadLocalImage, pruneLocalImages } from './imageCache';
 
 const STORAGE_KEY = 'lab_report_autosave_v1';
 
-// Convert File object to Base64 string
-const fileToBase64 = (file) => {
-    return new Promise((resolve, reject) => {
-        const reader = new FileReader();
-        reader.readAsDataURL(file);
-        reader.onload = () => resolve(reader.result);
-        reader.onerror = (error) => reject(error);
-    });
-};
+// Uploads to the draft asset store by File, so each File is sent only once
+const uploadedFiles = new WeakMap();
+
+// What the server has for this session, used to send only changed cells
+let lastSaved = null;
+
+// Saves run one at a time; edits made meanwhile are saved together afterwards
+let savePromise = null;
+let pendingData = null;
+let latestData = null;
+let retryTimer = null;
+
+// Wait before retrying failed image uploads when the server gives no Retry-After
+const UPLOAD_RETRY_SECONDS = 5;
 
-// Convert Base64 string to File object
+// Convert Base64 string to File object (restores snapshots saved before v4)
 const base64ToFile = async (base64String, filename) => {
     const res = await fetch(base64String);
     const blob = await res.blob();
     return new File([blob], filename, { type: blob.type });
 };
 
-// Save data to localStorage
-export const saveToStorage = async (data) => {
+const uploadFile = (editorSessionId, file) => {
+    let upload = uploadedFiles.get(file);
+    if (!upload) {
+        // Registered before the upload finishes so the File is never sent twice
+        upload = uploadDraftImage(editorSessionId, file).then(asset => {
+            saveLocalImage(asset.assetId, file).catch(e => console.warn("Failed to keep local image copy", e));
+            return asset;
+        });
+        uploadedFiles.set(file, upload);
+        // Failed uploads are tried again on the next save
+        upload.catch(() => uploadedFiles.delete(file));
+    }
+    return upload;
+};
+
+// Replace local files by asset references. Cells whose upload failed are
+// saved without an image and reported in failedUploads
+const toDraftCell = async (editorSessionId, cell, failedUploads) => {
+    const { file_obj, ...rest } = cell;
+    if (cell.type !== 'image' || !file_obj) return rest;
+
     try {
-        // Helper to process cells
-        const processCellList = async (cells) => {
-            return Promise.all(cells.map(async (cell) => {
-                const newCell = { ...cell };
-                if (cell.type === 'image' && cell.file_obj) {
-                    try {
-                        newCell.file_base64 = await fileToBase64(cell.file_obj);
-                        delete newCell.file_obj;
-                    } catch (e) {
-                        console.error("Failed to convert file to base64", e);
-                    }
-                }
-                return newCell;
-            }));
-        };
+        const asset = await uploadFile(editorSessionId, file_obj);
+        return { ...rest, asset_id: asset.assetId, asset_url: asset.assetUrl };
+    } catch (error) {
+        failedUploads.push(error);
+        return { ...rest, asset_missing: true };
+    }
+};
 
-        // Process top-level cells
-        const processedCanvasCells = await processCellList(data.canvasCells || []);
+// Split editor state into a layout of ids and a map of cells
+const toDraft = async (editorSessionId, data, failedUploads) => {
+    const cells = {};
+    const addCells = async (cellList) => {
+        const ids = [];
+        for (const cell of cellList) {
+            cells[cell.id] = await toDraftCell(editorSessionId, cell, failedUploads);
+            ids.push(cell.id);
+        }
+        return ids;
+    };
 
-        // Process sections/subsections
-        const processedSections = await Promise.all(data.sections.map(async (section) => {
-            const processedSubsections = await Promise.all(section.subsections.map(async (subsection) => {
-                const processedCells = await processCellList(subsection.cells);
-                return { ...subsection, cells: processedCells };
-            }));
-            return { ...section, subsections: processedSubsections };
-        }));
+    const canvasCellIds = await addCells(data.canvasCells || []);
+    const sections = [];
+    for (const section of data.sections) {
+        const subsections = [];
+        for (const subsection of section.subsections) {
+            subsections.push({ id: subsection.id, title: subsection.title, cellIds: await addCells(subsection.cells) });
+        }
+        sections.push({ id: section.id, title: section.title, subsections });
+    }
 
-        const finalData = {
-            title: data.title,
-            author: data.author,
-            canvasCells: processedCanvasCells,
-            sections: processedSections,
+    return { title: data.title, author: data.author, layout: { canvasCellIds, sections }, cells };
+};
+
+// Rebuild editor state from a draft
+const fromDraft = (draft) => {
+    const cellsFor = (ids) => ids.map(id => draft.cells[id]).filter(Boolean);
+    return {
+        title: draft.title,
+        author: draft.author,
+        canvasCells: cellsFor(draft.layout.canvasCellIds),
+        sections: draft.layout.sections.map(section => ({
+            id: section.id,
+            title: section.title,
+            subsections: section.subsections.map(subsection => ({
+                id: subsection.id,
+                title: subsection.title,
+                cells: cellsFor(subsection.cellIds)
+            }))
+        }))
+    };
+};
+
+const snapshot = (draft, revision) => ({
+    revision,
+    title: draft.title,
+    author: draft.author,
+    layout: JSON.stringify(draft.layout),
+    cells: Object.fromEntries(Object.entries(draft.cells).map(([id, cell]) => [id, JSON.stringify(cell)]))
+});
+
+// Retry the latest state once rate limited or failed uploads may succeed
+const scheduleUploadRetry = (failedUploads) => {
+    const seconds = Math.max(...failedUploads.map(error => error.retryAfter || UPLOAD_RETRY_SECONDS));
+    console.warn(`${failedUploads.length} image upload(s) failed, retrying in ${seconds}s`);
+    clearTimeout(retryTimer);
+    retryTimer = setTimeout(() => saveToStorage(latestData), seconds * 1000);
+};
+
+// Save data to the server draft, sending only what changed since the last save
+const saveNow = async (data) => {
+    try {
+        const editorSessionId = getEditorSessionId();
+        const failedUploads = [];
+        const draft = await toDraft(editorSessionId, data, failedUploads);
+        if (failedUploads.length) scheduleUploadRetry(failedUploads);
+
+        // Small local mirror without image bytes, used if the server is unreachable
+        localStorage.setItem(STORAGE_KEY, JSON.stringify({
+            ...fromDraft(draft),
             timestamp: Date.now(),
-            version: 3 // Bump version for new schema
-        };
+            version: 4
+        }));
+
+        let result = null;
+        if (lastSaved) {
+            const patch = { baseRevision: lastSaved.revision, cells: {} };
+            if (draft.title !== lastSaved.title) patch.title = draft.title;
+            if (draft.author !== lastSaved.author) patch.author = draft.author;
+            if (JSON.stringify(draft.layout) !== lastSaved.layout) patch.layout = draft.layout;
+            for (const [id, cell] of Object.entries(draft.cells)) {
+                if (JSON.stringify(cell) !== lastSaved.cells[id]) patch.cells[id] = cell;
+            }
+            const unchanged = !('title' in patch) && !('author' in patch) && !('layout' in patch)
+                && Object.keys(patch.cells).length === 0;
+            // e.g. an upload retry after the images were saved meanwhile
+            result = unchanged ? { revision: lastSaved.revision } : await patchDraft(editorSessionId, patch);
+        }
+        if (!result) {
+            result = await saveDraft(editorSessionId, draft);
+        }
 
-        localStorage.setItem(STORAGE_KEY, JSON.stringify(finalData));
+        lastSaved = snapshot(draft, result.revision);
         console.log("Autosaved at", new Date().toLocaleTimeString());
 
+        const assetIds = new Set(Object.values(draft.cells).map(cell => cell.asset_id).filter(Boolean));
+        pruneLocalImages(assetIds).catch(e => console.warn("Failed to prune local images", e));
+
     } catch (error) {
         if (error.name === 'QuotaExceededError') {
             console.warn("LocalStorage quota exceeded. Cannot autosave.");
@@ -70,8 +164,80 @@ export const saveToStorage = async (data) => {
     }
 };
 
-// Load data from localStorage
+// Overlapping saves would race on the draft revision and an older save
+// could overwrite a newer one, so saves are chained and only the latest
+// data waiting behind the running save is sent
+export const saveToStorage = (data) => {
+    latestData = data;
+    pendingData = data;
+    if (!savePromise) {
+        savePromise = (async () => {
+            try {
+                while (pendingData) {
+                    const next = pendingData;
+                    pendingData = null;
+                    await saveNow(next);
+                }
+            } finally {
+                savePromise = null;
+            }
+        })();
+    }
+    return savePromise;
+};
+
+// Image cells whose asset the server no longer has (e.g. after a restart)
+// are restored from the local copy, which is uploaded again on the next
+// save, or flagged so the user can re-upload them
+const resolveAssetCell = async (cell) => {
+    if (cell.type !== 'image' || !cell.asset_id || !cell.asset_url) return cell;
+    try {
+        if (await assetExists(cell.asset_url)) return cell;
+    } catch (error) {
+        // Server unreachable, keep the reference
+        return cell;
+    }
+
+    const { asset_id, asset_url, ...rest } = cell;
+    try {
+        const blob = await loadLocalImage(asset_id);
+        if (blob) {
+            return { ...rest, file_obj: new File([blob], cell.content || "restored_image", { type: blob.type }) };
+        }
+    } catch (error) {
+        console.warn("Failed to read local image copy:", error);
+    }
+    console.warn(`Image ${asset_id} is no longer available`);
+    return { ...rest, asset_missing: true };
+};
+
+const resolveAssets = async (data) => {
+    const resolveList = (cells) => Promise.all((cells || []).map(resolveAssetCell));
+    return {
+        ...data,
+        canvasCells: await resolveList(data.canvasCells),
+        sections: await Promise.all(data.sections.map(async (section) => ({
+            ...section,
+            subsections: await Promise.all(section.subsections.map(async (subsection) => ({
+                ...subsection,
+                cells: await resolveList(subsection.cells)
+            })))
+        })))
+    };
+};
+
+// Load data from the server draft, falling back to localStorage
 export const loadFromStorage = async () => {
+    try {
+        const draft = await getDraft(getEditorSessionId());
+        if (draft) {
+            lastSaved = snapshot(draft, draft.revision);
+            return await resolveAssets(fromDraft(draft));
+        }
+    } catch (error) {
+        console.warn("Failed to load server draft, using local copy:", error);
+    }
+
     try {
         const json = localStorage.getItem(STORAGE_KEY);
         if (!json) return null;
@@ -125,12 +291,12 @@ export const loadFromStorage = async () => {
             return { ...section, subsections: hydratedSubsections };
         }));
 
-        return {
+        return await resolveAssets({
             title: data.title,
             author: data.author,
             canvasCells: hydratedCanvasCells,
             sections: hydratedSections
-        };
+        });
 
     } catch (error) {
         console.error("Failed to load/restore data:", error);